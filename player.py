@@ -6,38 +6,185 @@ import time
 import argparse
 from pythonosc import dispatcher
 from pythonosc import osc_server
+from pythonosc import osc_message_builder
 import threading
 import subprocess
 import signal
+import socket
 import logging
-from pathlib import Path
+import logging.handlers
+import queue
+import atexit
+import selectors
+import collections
+import functools
+import bisect
+import struct
+import ctypes
+import json
+import shutil
+import hashlib
+import concurrent.futures
+import contextlib
+import itertools
+import re
+import math
+import asyncio
+from pathlib import Path, PurePosixPath
+
+try:
+    import uvloop  # Optional, faster event loop for the OSC server
+except ImportError:
+    uvloop = None
+
+try:
+    import alsaaudio  # Optional, in-process mixer access instead of forking amixer
+except ImportError:
+    alsaaudio = None
+
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate the log file at this size
+LOG_BACKUP_COUNT = 3  # Rotated log files to keep
+LOG_FLUSH_INTERVAL = 1.0  # Seconds between log file flushes; errors are flushed at once
+
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotating log file that flushes in batches rather than after every record"""
+    
+    def __init__(self, filename, flush_interval=LOG_FLUSH_INTERVAL, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+    
+    def emit(self, record):
+        super().emit(record)
+        if record.levelno >= logging.ERROR:
+            self.sync()
+    
+    def flush(self):
+        # Called by emit() for every record; only write out once per interval
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.sync()
+    
+    def sync(self):
+        """Write buffered records to the file now"""
+        super().flush()
+        self.last_flush = time.monotonic()
+    
+    def close(self):
+        self.sync()
+        super().close()
+
+class LogListener(logging.handlers.QueueListener):
+    """Writes queued log records from a background thread
+    
+    Buffered records are flushed whenever the queue has been idle for the
+    flush interval, so the tail of a burst doesn't sit in memory.
+    """
+    
+    def __init__(self, log_queue, *handlers, flush_interval=LOG_FLUSH_INTERVAL):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+    
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+log_listener = None  # LogListener writing the log, started by setup_logging()
 
 # Set up logging
-def setup_logging(log_file=None):
-    """Set up logging configuration"""
-    log_dir = Path.home() / "logs"
-    log_dir.mkdir(exist_ok=True)
+def setup_logging(log_file=None, level=logging.INFO):
+    """Set up logging configuration
+    
+    Loggers only put records on a queue; the file and console are written
+    by a background thread, so a slow SD card never holds up a cue.
+    """
+    global log_listener
     
     if log_file is None:
+        log_dir = Path.home() / "logs"
+        log_dir.mkdir(exist_ok=True)
         log_file = log_dir / "video_player.log"
     
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = BufferedRotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    
+    # The queue handler only merges the message; the listener's handlers
+    # add the timestamp and level
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=level, handlers=[queue_handler], force=True)
+    if log_listener is not None:
+        log_listener.stop()
+    log_listener = LogListener(log_queue, file_handler, console_handler)
+    log_listener.start()
+    atexit.register(log_listener.stop)
     return logging.getLogger("VideoPlayer")
 
-logger = setup_logging()
+# Handlers are set up by setup_logging() in main(), so importing has no side effects
+logger = logging.getLogger("VideoPlayer")
 
 # Default configuration
 DEFAULT_OSC_IP = "0.0.0.0"  # Listen on all interfaces
 DEFAULT_OSC_PORT = 8000
 DEFAULT_VIDEO_DIRECTORY = str(Path.home() / "Videos")  # Default to user's Videos directory
 VLC_PATH = "/usr/bin/cvlc"  # Path to command-line VLC
+CACHE_DIR = Path.home() / ".cache" / "piosc"  # Black image, probe cache and sockets
+VLC_SOCKET_DIR = CACHE_DIR  # RC control sockets live here
+PROBE_CACHE_PATH = CACHE_DIR / "probe-cache.json"
+PROBE_WORKERS = max(1, min(4, os.cpu_count() or 1))  # Concurrent ffprobe runs
+DEFAULT_PRELOAD_COUNT = 2  # Upcoming show cues to preload
+DEFAULT_PRELOAD_BUDGET_MB = 256  # Page cache the preloader may claim
+PRELOAD_SECONDS = 10  # Seconds of media to read ahead from the start of a file
+PRELOAD_DEFAULT_BYTES = 32 * 1024 * 1024  # Read-ahead when the bitrate is unknown
+PRELOAD_TAIL_BYTES = 1024 * 1024  # End of file, where an MP4 index may live
+RAM_CACHE_DIR = Path("/dev/shm") / "piosc"  # tmpfs for hot cues
+DEFAULT_RAM_CACHE_MB = 256
+
+# Media the Pi plays smoothly (see "File Formats" in the README)
+PROFILE_CODECS = ("h264", "hevc")
+DEFAULT_PROFILE_MAX_HEIGHT = 1080
+DEFAULT_PROFILE_MAX_FPS = 60
+DEFAULT_PROFILE_MAX_BITRATE_MBPS = 10
+TRANSCODE_DIR = CACHE_DIR / "transcoded"  # Normalized media, named by content fingerprint
+FINGERPRINT_SAMPLE = 1024 * 1024  # Bytes hashed at each sample point of a file
+HISTORY_SIZE = 1024  # Recent events kept in memory for /history
+HISTORY_REPLY_DEFAULT = 20  # Events sent back by /history without a count
+HISTORY_DUMP_DIR = CACHE_DIR / "history"  # Where /history_dump writes, whatever the name asked for
+DEFAULT_METRICS_IP = "127.0.0.1"  # Only local scrapers unless --metrics-ip says otherwise
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Latency histogram bounds, in seconds
+METRICS_MAX_LABELS = 64  # Distinct label values per counter; any more are counted as "other"
+PLAYER_STARTUP_TIMEOUT = 10.0  # Seconds to wait for VLC's control socket
+FIRST_FRAME_TIMEOUT = 5.0  # Seconds after GO to wait for a cue's first new frame
+VLC_STATS_INTERVAL = 0.25  # VLC refreshes an input's statistics this often, not per frame
+FIRST_FRAME_POLL = 0.05  # Seconds between checks of VLC's displayed frame count
+STAGE_FRAME_RESOLUTION = 0.02  # A stage window's change is shown at the next refresh, 20 ms at 50 Hz
+SLOT_NAMES = ("A", "B")  # Two players: one on screen, one preloading the next cue
+CROSSFADE_RATE = 25  # Crossfade steps per second
+DEFAULT_STOP_TIMEOUT = 2.0  # Seconds a child gets to exit before SIGKILL
+CURSOR_RESTART_DELAY = 5.0  # Seconds before restarting a crashed cursor hider
+VOLUME_WRITE_INTERVAL = 0.05  # Minimum seconds between mixer writes
+VOLUME_RAMP_RATE = 100  # Volume fade steps per second
+VOLUME_FADE_FLOOR_DB = -60.0  # Fades treat anything quieter as silence
+VOLUME_COMMANDS = ("/volume_set", "/volume_up", "/volume_down", "/volume_fade")  # Run at once, not queued
+# External programs checked by preflight(): name -> (Debian package, what it's used for)
+EXTERNAL_TOOLS = {
+    "feh": ("feh", "the black screen"),
+    "unclutter": ("unclutter", "hiding the mouse pointer"),
+    "xdotool": ("xdotool", "finding windows, and cue switching without libX11"),
+    "xprop": ("x11-utils", "picture crossfades without libX11"),
+    "xset": ("x11-xserver-utils", "disabling screen blanking"),
+    "ffprobe": ("ffmpeg", "media probing"),
+    "ffmpeg": ("ffmpeg", "--transcode"),
+    "amixer": ("alsa-utils", "volume control without pyalsaaudio"),
+    "alsactl": ("alsa-utils", "following outside volume changes without pyalsaaudio"),
+}
 
 # Environment variables for VLC
 VLC_ENV = os.environ.copy()
@@ -48,175 +195,2444 @@ if xauth_path.exists():
     VLC_ENV["XAUTHORITY"] = str(xauth_path)
 
 # Global variables
-current_process = None
+players = [None, None]  # Persistent VLCPlayer per slot
+live_slot = 0        # Slot currently on screen, the other one is standby
+armed_cue = None     # Path of the cue loaded by /cue and waiting for /go
+crossfade_seconds = 0.0  # Default crossfade length for /go and /play
+crossfade_thread = None
+crossfade_cancel = threading.Event()
 is_running = True
 current_volume = 80  # Default volume level (0-100)
 volume_step = 5      # How much to change volume each time
+stop_timeout = DEFAULT_STOP_TIMEOUT
 video_directory = DEFAULT_VIDEO_DIRECTORY
+media_index = None   # MediaIndex of video_directory, built in main()
+probe_cache = None   # ProbeCache of media metadata, loaded in main()
+osc_transport = None  # OSC server transport, used to reply to queries
+event_loop = None    # Event loop running the OSC server
+# Runs OSC commands one at a time, in the order they arrived
+command_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="command")
+command_received = None  # time.monotonic() the running OSC command arrived, None outside OSC commands
+packet_received = None  # time.monotonic() the datagram being dispatched arrived, set on the event loop
+tracer = None        # Tracer writing --trace-file, created in main()
+trace_context = threading.local()  # trace_id of the OSC command running on this thread
+volume_writer = None  # VolumeWriter for the mixer, created below
+volume_ramp = None   # VolumeRamp running volume fades, created below
+stop_fade_seconds = 0.0  # Default fade-out length for /stop
+audio_card = None    # ALSA card (index or name) from --audio-card, None for the default
+audio_control = None  # Mixer control from --audio-control, discovered when None
+mixer = None         # alsaaudio.Mixer for the volume control, opened by open_mixer()
+mixer_checked = False  # open_mixer() already tried, don't retry on every call
+mixer_lock = threading.Lock()  # ALSA mixer handles are not thread safe
+stage = None         # Stage of player windows, opened by open_stage()
+stage_checked = False  # open_stage() already tried, don't retry on every call
+stage_lock = threading.Lock()
+preloader = None     # Preloader for the page cache, created in main()
+show_cues = []       # Cue names from --show-file, in show order
+ram_cache = None     # RamCache of hot cues, created in main()
+show_position = 0    # Index in show_cues of the last cue armed
+preload_count = DEFAULT_PRELOAD_COUNT
+transcoder = None    # Transcoder for out-of-profile media, created in main() with --transcode
+profile_max_height = DEFAULT_PROFILE_MAX_HEIGHT
+profile_max_fps = DEFAULT_PROFILE_MAX_FPS
+profile_max_bitrate = DEFAULT_PROFILE_MAX_BITRATE_MBPS * 1_000_000
+
+@functools.lru_cache(maxsize=None)
+def find_tool(name):
+    """Look up an external program on PATH once; later lookups are free"""
+    return shutil.which(name)
+
+def preflight(transcode=False):
+    """Check once at startup for the external programs PiOSC runs
+    
+    Missing programs are reported here, and the features that need them
+    are skipped later without forking `which` or a package manager.
+    """
+    if not os.access(VLC_PATH, os.X_OK):
+        logger.error(f"VLC not found at {VLC_PATH}, videos can't be played")
+    
+    optional = {"ffmpeg"} if not transcode else set()
+    if alsaaudio is not None:
+        optional |= {"amixer", "alsactl"}
+    missing = [name for name in EXTERNAL_TOOLS if name not in optional and find_tool(name) is None]
+    for name in missing:
+        logger.warning(f"{name} not found, needed for {EXTERNAL_TOOLS[name][1]}")
+    if missing:
+        packages = sorted({EXTERNAL_TOOLS[name][0] for name in missing})
+        logger.warning(f"Install the missing programs with: sudo apt install {' '.join(packages)}")
+    return missing
 
-def get_current_mixer_controls():
+def amixer_args(*args):
+    """Build an amixer command line for the configured card"""
+    card = ["-c", str(audio_card)] if audio_card is not None else []
+    return ["amixer", *card, *args]
+
+def alsa_card_index(card):
+    """alsaaudio card index for a card number or name, -1 for the default card"""
+    if card is None:
+        return -1
+    if str(card).isdigit():
+        return int(card)
+    return alsaaudio.cards().index(card)
+
+def get_current_mixer_controls(card=None):
     """Get the available mixer controls to determine which one to use for volume"""
     try:
-        result = subprocess.run(['amixer', 'scontrols'], 
-                               stdout=subprocess.PIPE, 
-                               stderr=subprocess.PIPE, 
-                               text=True)
-        controls = result.stdout.strip().split('\n')
+        if alsaaudio is not None:
+            controls = alsaaudio.mixers(cardindex=alsa_card_index(card))
+        else:
+            result = subprocess.run(amixer_args('scontrols'), 
+                                   stdout=subprocess.PIPE, 
+                                   stderr=subprocess.PIPE, 
+                                   text=True)
+            controls = re.findall(r"'(.+?)'", result.stdout)
         logger.info(f"Available mixer controls: {controls}")
         return controls
     except Exception as e:
         logger.error(f"Error getting mixer controls: {e}")
         return []
 
-def get_volume_control():
-    """Determine which volume control to use"""
-    controls = get_current_mixer_controls()
+@functools.lru_cache(maxsize=None)
+def get_volume_control(card=None):
+    """Determine which volume control to use on a card, once per card"""
+    controls = get_current_mixer_controls(card)
+    
+    # Try to find the appropriate control
+    for control in ("Master", "PCM", "Speaker"):
+        if control in controls:
+            logger.info(f"Using volume control: {control}")
+            return control
+    
+    # Default to PCM if no known control is found
+    logger.warning("Could not identify volume control, defaulting to PCM")
+    return "PCM"
+
+def volume_control():
+    """The mixer control volume commands act on, discovered on first use"""
+    return audio_control or get_volume_control(audio_card)
+
+def open_mixer():
+    """Open the volume control with alsaaudio, or return None to fall back to amixer"""
+    global mixer, mixer_checked
+    
+    with mixer_lock:
+        if mixer_checked:
+            return mixer
+        mixer_checked = True
+        
+        if alsaaudio is None:
+            logger.info("alsaaudio not installed, using amixer for volume")
+            return None
+        
+        control = volume_control()
+        try:
+            mixer = alsaaudio.Mixer(control, cardindex=alsa_card_index(audio_card))
+            logger.info(f"Opened mixer control {control} with alsaaudio")
+        except (alsaaudio.ALSAAudioError, ValueError) as e:
+            logger.warning(f"Could not open mixer control {control}, using amixer: {e}")
+        return mixer
+
+def set_system_volume(volume_percent):
+    """Set the system volume, in process if possible, otherwise using amixer"""
+    try:
+        # Ensure volume is within valid range
+        volume_percent = max(0, min(100, volume_percent))
+        
+        if open_mixer() is not None:
+            with mixer_lock:
+                mixer.setvolume(volume_percent)
+            return True
+        
+        # Run amixer command to set volume
+        cmd = amixer_args('set', volume_control(), f'{volume_percent}%')
+        logger.debug("Running volume command: %s", ' '.join(cmd))
+        
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode == 0:
+            return True
+        else:
+            logger.error(f"Error setting volume: {result.stderr}")
+            return False
+    except Exception as e:
+        logger.error(f"Exception while setting volume: {e}")
+        return False
+
+def get_system_volume():
+    """Get the current system volume"""
+    try:
+        if open_mixer() is not None:
+            with mixer_lock:
+                return int(mixer.getvolume()[0])
+        
+        result = subprocess.run(amixer_args('get', volume_control()), 
+                               stdout=subprocess.PIPE, 
+                               stderr=subprocess.PIPE, 
+                               text=True)
+        
+        # Parse the output to get the volume percentage
+        output = result.stdout
+        if "%" in output:
+            volume_str = output[output.find("[")+1:output.find("%")]
+            return int(volume_str)
+        
+        logger.warning(f"Could not parse volume from output: {output}")
+        return 80  # Default if we can't determine
+    except Exception as e:
+        logger.error(f"Error getting system volume: {e}")
+        return 80  # Default if error
+
+class VolumeWriter:
+    """Applies volume changes to the mixer from a background thread
+    
+    A fader sends far more updates than the mixer needs. Requests that
+    arrive while a write is in flight collapse into the newest level, the
+    mixer is written at most once per VOLUME_WRITE_INTERVAL, and the last
+    level requested is always the one left applied.
+    """
+    
+    def __init__(self, interval=VOLUME_WRITE_INTERVAL):
+        self.interval = interval
+        self.pending = None
+        self.requested = None  # When the oldest level not yet written was requested
+        self.requests = 0  # Requests since the last burst was logged
+        self.last_write = 0.0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+    
+    def request(self, level):
+        """Queue a level for the mixer, replacing any level not yet written"""
+        with self.lock:
+            self.requests += 1
+            self.pending = level
+            if self.requested is None:
+                self.requested = time.monotonic()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="volume-writer", daemon=True)
+                self.thread.start()
+        self.wake.set()
+    
+    def target(self):
+        """The level still waiting to be written, or None"""
+        with self.lock:
+            return self.pending
+    
+    def _run(self):
+        global current_volume
+        writes = 0
+        
+        while True:
+            self.wake.wait()
+            
+            # Rate limit; updates arriving meanwhile replace the pending level
+            delay = self.last_write + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            
+            with self.lock:
+                level, self.pending = self.pending, None
+                requested, self.requested = self.requested, None
+                self.wake.clear()
+            if level is None:
+                continue
+            
+            # Update the cache first so the mixer event for this write
+            # isn't mistaken for an outside change
+            self.last_write = time.monotonic()
+            current_volume = level
+            if set_system_volume(level):
+                writes += 1
+                volume_latency.observe(time.monotonic() - requested)
+            else:
+                current_volume = get_system_volume()
+            
+            # Log once per burst, when no new level arrives for an interval
+            if not self.wake.wait(self.interval):
+                with self.lock:
+                    requests, self.requests = self.requests, 0
+                logger.info("Volume set to %s%% (%s updates, %s mixer writes)", current_volume, requests, writes)
+                history.record("volume", level=current_volume, updates=requests, writes=writes)
+                writes = 0
+
+volume_writer = VolumeWriter()
+
+def linear_curve(start, end, fraction):
+    """Level a fraction of the way from start to end (0.0-1.0), interpolated linearly"""
+    return end if fraction >= 1.0 else start + (end - start) * fraction
+
+def fade_curve(start, end, fraction):
+    """Level a fraction of the way from start to end (0.0-1.0), interpolated in dB"""
+    if fraction >= 1.0:
+        return end
+    floor = VOLUME_FADE_FLOOR_DB
+    start_db = 20 * math.log10(start) if start > 0 else floor
+    end_db = 20 * math.log10(end) if end > 0 else floor
+    level_db = max(floor, start_db) + (max(floor, end_db) - max(floor, start_db)) * fraction
+    return 0.0 if level_db <= floor else 10 ** (level_db / 20)
+
+class VolumeEnvelope:
+    """One fade run by the VolumeRamp"""
+    
+    def __init__(self, name, apply, start, end, seconds, on_done, curve):
+        self.name = name
+        self.apply = apply
+        self.curve = curve
+        self.start = start
+        self.end = end
+        self.seconds = seconds
+        self.on_done = on_done
+        self.level = start
+        self.start_time = time.monotonic()
+
+class VolumeRamp:
+    """Runs volume fades on a fixed tick from one background thread
+    
+    Only one envelope runs at a time; starting a fade replaces the running
+    one, so repeated fades never pile up threads or fight each other.
+    """
+    
+    def __init__(self, rate=VOLUME_RAMP_RATE):
+        self.tick = 1.0 / rate
+        self.envelope = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+    
+    def start(self, name, apply, start, end, seconds, on_done=None, curve=fade_curve):
+        """Fade from start to end over seconds, calling apply(level) each tick
+        
+        The default dB curve suits a linear amplitude like VLC's volume.
+        Levels that are already on a dB scale need linear_curve instead.
+        """
+        with self.lock:
+            self.envelope = VolumeEnvelope(name, apply, start, end, max(0.0, seconds), on_done, curve)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="volume-ramp", daemon=True)
+                self.thread.start()
+        self.wake.set()
+    
+    def cancel(self, name=None):
+        """Stop the running fade (only if it has this name, when given) and return it"""
+        with self.lock:
+            envelope = self.envelope
+            if envelope is None or (name is not None and envelope.name != name):
+                return None
+            self.envelope = None
+            return envelope
+    
+    def _run(self):
+        next_tick = time.monotonic()
+        
+        while True:
+            if not self.wake.is_set():
+                self.wake.wait()
+                next_tick = time.monotonic()
+            
+            with self.lock:
+                envelope = self.envelope
+                if envelope is None:
+                    self.wake.clear()
+                    continue
+                
+                elapsed = time.monotonic() - envelope.start_time
+                fraction = elapsed / envelope.seconds if envelope.seconds > 0 else 1.0
+                envelope.level = envelope.curve(envelope.start, envelope.end, fraction)
+                try:
+                    envelope.apply(envelope.level)
+                except Exception as e:
+                    logger.error(f"Error during {envelope.name} fade: {e}")
+                    fraction = 1.0
+                if fraction >= 1.0:
+                    self.envelope = None
+            
+            if fraction >= 1.0:
+                if envelope.on_done is not None:
+                    envelope.on_done()
+                continue
+            
+            # Keep a fixed schedule rather than drifting by the apply time
+            next_tick += self.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+
+volume_ramp = VolumeRamp()
+
+class EventHistory:
+    """Fixed-size ring buffer of recent structured events
+    
+    The slots are allocated up front and recording only swaps a tuple into
+    a slot under a lock, so it is cheap enough for every hot path and never
+    touches the disk. Fields must be JSON serializable.
+    """
+    
+    def __init__(self, size=HISTORY_SIZE):
+        self.slots = [None] * size
+        self.count = 0  # Events recorded since startup
+        self.lock = threading.Lock()
+    
+    def record(self, kind, **fields):
+        """Add an event, overwriting the oldest one once the buffer is full"""
+        event = (time.time(), kind, fields)
+        with self.lock:
+            self.slots[self.count % len(self.slots)] = event
+            self.count += 1
+    
+    def recent(self, limit=None):
+        """Return up to limit of the most recent events, oldest first"""
+        with self.lock:
+            available = min(self.count, len(self.slots))
+            limit = available if limit is None else max(0, min(limit, available))
+            return [self.slots[index % len(self.slots)] for index in range(self.count - limit, self.count)]
+    
+    def dump(self, path):
+        """Write every buffered event to a JSONL file"""
+        with open(path, "w") as f:
+            for timestamp, kind, fields in self.recent():
+                f.write(json.dumps({"time": timestamp, "event": kind, **fields}, default=str) + "\n")
+
+history = EventHistory()
+
+def metric_label(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Counter:
+    """Prometheus counter, optionally split by the value of one label
+    
+    Updates take a lock only for a dictionary increment, so counting on
+    the OSC path costs next to nothing.
+    """
+    
+    def __init__(self, name, description, label=None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.values = {}
+        self.lock = threading.Lock()
+    
+    def inc(self, label_value=None):
+        """Add one to the counter, or to the count for a label value"""
+        with self.lock:
+            # Label values come from the network, so cap how many are kept
+            if label_value not in self.values and len(self.values) >= METRICS_MAX_LABELS:
+                label_value = "other"
+            self.values[label_value] = self.values.get(label_value, 0) + 1
+    
+    def render(self):
+        """Return the counter in the Prometheus text format, as lines"""
+        with self.lock:
+            values = dict(self.values)
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        if self.label is None:
+            lines.append(f"{self.name} {values.get(None, 0)}")
+        else:
+            for value, count in values.items():
+                lines.append(f'{self.name}{{{self.label}="{metric_label(value)}"}} {count}')
+        return lines
+
+class Histogram:
+    """Prometheus histogram of durations in seconds
+    
+    The bucket is looked up before taking the lock, which then only
+    covers two additions.
+    """
+    
+    def __init__(self, name, description, buckets=METRICS_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Per bucket, the last one is +Inf
+        self.total = 0.0
+        self.lock = threading.Lock()
+    
+    def observe(self, seconds):
+        """Record one duration"""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += seconds
+    
+    def render(self):
+        """Return the histogram in the Prometheus text format, as lines"""
+        with self.lock:
+            counts = list(self.counts)
+            total = self.total
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+# Metrics served on /metrics with --metrics-port
+cue_load_latency = Histogram("piosc_cue_load_seconds",
+                             "OSC message received to media loaded in the standby player")
+cue_first_frame_latency = Histogram("piosc_cue_first_frame_seconds",
+                                    "Media loaded to its first frame decoded and held paused")
+cue_on_screen_latency = Histogram("piosc_cue_on_screen_seconds",
+                                  "OSC message received to the cue's first new frame rendered on screen")
+stop_latency = Histogram("piosc_stop_seconds", "Time to stop playback on both players")
+volume_latency = Histogram("piosc_volume_command_seconds", "Volume request to the mixer write that applied it")
+osc_messages = Counter("piosc_osc_messages_total", "OSC messages received", label="address")
+unknown_commands = Counter("piosc_unknown_commands_total", "OSC messages with an unknown command")
+child_spawns = Counter("piosc_child_spawns_total", "Child processes started", label="role")
+orphaned_children = Counter("piosc_orphaned_children_total",
+                            "Children that exited leaving processes behind in their group", label="role")
+all_metrics = [cue_load_latency, cue_first_frame_latency, cue_on_screen_latency, stop_latency, volume_latency,
+               osc_messages, unknown_commands, child_spawns, orphaned_children]
+
+class Tracer:
+    """Writes spans of OSC commands to a Chrome trace file from a background thread
+    
+    Spans are complete ("X") events of the Trace Event Format in a single
+    JSON array, which Perfetto and chrome://tracing open directly. Adding
+    a span only puts a tuple on a queue; the JSON is built by the writer.
+    The array is closed on shutdown, and both viewers also read a file
+    left without its closing bracket.
+    """
+    
+    def __init__(self, path, flush_interval=LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.ids = itertools.count(1)
+        self.queue = queue.SimpleQueue()
+        self.file = open(path, "w")
+        self.file.write("[")
+        self.written = 0
+        self.threads = set()  # Threads already named in the file
+        self.thread = threading.Thread(target=self._run, name="tracer", daemon=True)
+        self.thread.start()
+    
+    def new_trace(self):
+        """Return a new trace ID"""
+        return next(self.ids)
+    
+    def add(self, name, category, start, end, trace_id, **args):
+        """Record a span between two time.monotonic() times"""
+        thread = threading.current_thread()
+        self.queue.put((name, category, start, end, trace_id, thread.native_id, thread.name, args))
+    
+    def close(self):
+        """Write the spans still queued and close the file"""
+        if self.file.closed:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.file.write("\n]\n")
+        self.file.close()
+    
+    def _write(self, event):
+        self.file.write(("," if self.written else "") + "\n" + json.dumps(event, default=str))
+        self.written += 1
+    
+    def _run(self):
+        pid = os.getpid()
+        while True:
+            try:
+                span = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self.file.flush()
+                continue
+            if span is None:
+                return
+            name, category, start, end, trace_id, tid, thread_name, args = span
+            if tid not in self.threads:
+                self.threads.add(tid)
+                self._write({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                             "args": {"name": thread_name}})
+            self._write({"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                         "ts": round(start * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                         "args": {"trace_id": trace_id, **args}})
+
+@contextlib.contextmanager
+def trace_span(name, category, **args):
+    """Time the enclosed block as a span of the OSC command running on this thread
+    
+    Does nothing without --trace-file, or on threads not running a command.
+    """
+    trace_id = getattr(trace_context, "trace_id", None) if tracer else None
+    if trace_id is None:
+        yield
+        return
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        tracer.add(name, category, start, time.monotonic(), trace_id, **args)
+
+class TimedDispatcher(dispatcher.Dispatcher):
+    """OSC dispatcher that notes when each datagram arrived, before decoding it"""
+    
+    def call_handlers_for_packet(self, data, client_address):
+        global packet_received
+        packet_received = time.monotonic()
+        return super().call_handlers_for_packet(data, client_address)
+
+class SupervisedChild:
+    """Bookkeeping for one child process watched by the ProcessSupervisor"""
+
+    def __init__(self, process, name, on_exit, on_line, history):
+        self.process = process
+        self.name = name
+        self.on_exit = on_exit
+        self.on_line = on_line
+        self.output = collections.deque(maxlen=history)  # Recent (stream, line) tuples
+        self.partial = {}  # Unterminated output per stream
+        self.pipes = {}  # Stream name -> pipe, for the final read at exit
+        self.pidfd = None
+        self.open_streams = 0
+        self.exited = False
+
+class ProcessSupervisor:
+    """Watch the output and exit of every child process from a single thread
+
+    Child pipes are read without blocking through a selector, so a chatty
+    stderr can never stall VLC behind a full stdout pipe. Exits are reported
+    as soon as they happen through pidfds, or a short poll where those are
+    not available.
+    """
+
+    POLL_INTERVAL = 0.5  # Exit poll interval for children without a pidfd
+    FINISHED_HISTORY = 32  # Exited children whose output is kept around
+    FAILURE_OUTPUT_LINES = 20  # Lines of output logged when a child fails
+
+    def __init__(self, history=200):
+        self.history = history
+        self.selector = selectors.DefaultSelector()
+        self.children = {}
+        self.finished = collections.OrderedDict()
+        self.pending = collections.deque()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        os.set_blocking(self.wake_write, False)
+
+    def watch(self, process, name, on_exit=None, on_line=None):
+        """Supervise a child process, reading its stdout/stderr pipes if any
+
+        on_line(stream, line) takes the child's stdout lines instead of the log.
+        """
+        self._schedule(functools.partial(self._register, process, name, on_exit, on_line))
+
+    def add_reader(self, fd, callback):
+        """Call callback(fd) from the supervisor thread whenever fd is readable"""
+        self._schedule(functools.partial(self.selector.register, fd, selectors.EVENT_READ, callback))
+
+    def _schedule(self, action):
+        with self.lock:
+            self.pending.append(action)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="supervisor", daemon=True)
+                self.thread.start()
+        try:
+            os.write(self.wake_write, b"\0")
+        except BlockingIOError:
+            pass  # Already woken
+
+    def recent_output(self, process):
+        """Return a child's recent output as (stream, line) tuples"""
+        with self.lock:
+            child = self.children.get(process.pid) or self.finished.get(process.pid)
+            return list(child.output) if child else []
+
+    def _run(self):
+        self.selector.register(self.wake_read, selectors.EVENT_READ, self._wake)
+        while True:
+            with self.lock:
+                polling = any(child.pidfd is None for child in self.children.values())
+            for key, _ in self.selector.select(self.POLL_INTERVAL if polling else None):
+                try:
+                    key.data(key.fd)
+                except Exception as e:
+                    logger.error(f"Process supervisor error: {e}")
+            if polling:
+                for child in list(self.children.values()):
+                    if child.pidfd is None and child.process.poll() is not None:
+                        self._finish(child)
+
+    def _wake(self, fd):
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return
+                action = self.pending.popleft()
+            action()
+
+    def _register(self, process, name, on_exit, on_line):
+        child = SupervisedChild(process, name, on_exit, on_line, self.history)
+        for stream, pipe in (("stdout", process.stdout), ("stderr", process.stderr)):
+            if pipe is None:
+                continue
+            os.set_blocking(pipe.fileno(), False)
+            self.selector.register(pipe, selectors.EVENT_READ,
+                                   functools.partial(self._read, child, stream, pipe))
+            child.pipes[stream] = pipe
+            child.open_streams += 1
+        if hasattr(os, "pidfd_open"):
+            try:
+                child.pidfd = os.pidfd_open(process.pid)
+                self.selector.register(child.pidfd, selectors.EVENT_READ,
+                                       functools.partial(self._exited, child))
+            except OSError:
+                child.pidfd = None  # Already reaped or kernel without pidfd support
+        with self.lock:
+            self.children[process.pid] = child
+        if process.poll() is not None:
+            self._finish(child)
+
+    def _read(self, child, stream, pipe, fd):
+        """Read one chunk from a child's pipe, returning False once nothing is left"""
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return False
+        if not data:
+            self.selector.unregister(pipe)
+            pipe.close()
+            self._line(child, stream, child.partial.pop(stream, b""))
+            return False
+        lines = (child.partial.get(stream, b"") + data).split(b"\n")
+        child.partial[stream] = lines.pop()
+        for line in lines:
+            self._line(child, stream, line)
+        return True
+
+    def _line(self, child, stream, line):
+        text = line.decode(errors="replace").strip()
+        if not text:
+            return
+        with self.lock:
+            child.output.append((stream, text))
+        if stream == "stderr":
+            logger.warning(f"{child.name} error: {text}")
+        elif child.on_line is not None:
+            try:
+                child.on_line(stream, text)
+            except Exception as e:
+                logger.error(f"Error in output handler for {child.name}: {e}")
+        else:
+            logger.debug("%s output: %s", child.name, text)
+
+    def _exited(self, child, fd):
+        self._finish(child)
+
+    def _finish(self, child):
+        if child.exited:
+            return
+        child.exited = True
+        if child.pidfd is not None:
+            self.selector.unregister(child.pidfd)
+            os.close(child.pidfd)
+        return_code = child.process.wait()  # Already exited, this only reaps it
+        logger.info(f"{child.name} process ended with return code: {return_code}")
+        history.record("exit", name=child.name, pid=child.process.pid, code=return_code)
+        
+        # SIGTERM and SIGKILL are how PiOSC stops children itself
+        stopped = -return_code in (signal.SIGTERM, signal.SIGKILL)
+        
+        # A failure is explained by the child's last words, so read whatever
+        # is still in its pipes and log them
+        if return_code != 0 and not stopped:
+            for stream, pipe in child.pipes.items():
+                while not pipe.closed and self._read(child, stream, pipe, pipe.fileno()):
+                    pass
+            output = self.recent_output(child.process)[-self.FAILURE_OUTPUT_LINES:]
+            if output:
+                logger.warning(f"{child.name} failed with return code {return_code}, last output:\n" +
+                               "\n".join(f"  [{stream}] {line}" for stream, line in output))
+        
+        # Children lead their own process group, so a group that is still
+        # there holds processes the child left behind. A stopped child's
+        # group was signalled as a whole and may simply not be gone yet.
+        if not stopped:
+            try:
+                os.killpg(child.process.pid, 0)
+                orphaned_children.inc(child.name)
+                logger.warning(f"{child.name} exited leaving processes behind in its group")
+            except (ProcessLookupError, PermissionError):
+                pass
+        
+        with self.lock:
+            self.children.pop(child.process.pid, None)
+            self.finished[child.process.pid] = child
+            while len(self.finished) > self.FINISHED_HISTORY:
+                self.finished.popitem(last=False)
+        if child.on_exit is not None:
+            try:
+                child.on_exit(child.process)
+            except Exception as e:
+                logger.error(f"Error in exit handler for {child.name}: {e}")
+
+supervisor = ProcessSupervisor()
+
+class VLCPlayer:
+    """A single long-lived VLC instance controlled over its RC interface
+
+    VLC is started once and media is swapped through the RC socket, so a
+    cue no longer pays for a cold VLC start.
+    """
+
+    PROMPT = b"> "
+
+    def __init__(self, name, stage_window=None):
+        self.name = name
+        self.role = f"vlc-{name.lower()}"
+        self.socket_path = VLC_SOCKET_DIR / f"vlc-{name.lower()}.sock"
+        self.media = None   # Path of the loaded media
+        self.stage_window = stage_window  # Stage window VLC draws into, None if VLC opens its own
+        self.window = stage_window  # X window of the current video output
+        self.armed_frames = 1  # Frames displayed when the media was armed, paused
+        self.frame_watch = None  # Future set when the stage window changes after GO, None without one
+        self.process = None
+        self.sock = None
+        self.buffer = b""
+        self.lock = threading.Lock()
+
+    def is_alive(self):
+        """Check whether the VLC process is still running"""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start VLC and connect to its control socket"""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+        if self.stage_window is not None:
+            # Draw into the stage window, which PiOSC stacks itself
+            display_args = [f"--drawable-xid={self.stage_window}"]
+        else:
+            display_args = [
+                "--fullscreen",        # Full screen mode
+                "--video-on-top",      # Keep video on top
+            ]
+        
+        self.process = registry.spawn(self.role, [
+            VLC_PATH,
+            "--extraintf", "rc",       # Remote control interface...
+            "--rc-unix", str(self.socket_path),  # ...on a local socket
+            *display_args,
+            "--no-video-title-show",   # Don't show video title
+            "--loop",                  # Loop VLC when playback ends
+            "--no-osd",                # No on-screen display
+            "--key-quit", "Ctrl+c",    # Change quit key to reduce accidental exits
+            "--mouse-hide-timeout=1",  # Hide mouse cursor quickly
+            "--vout", "x11",           # Use X11 video output for Pi 5
+        ], env=VLC_ENV, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        # Wait for VLC to open its control socket
+        deadline = time.monotonic() + PLAYER_STARTUP_TIMEOUT
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"VLC exited during startup with code {self.process.returncode}")
+            try:
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.connect(str(self.socket_path))
+                break
+            except OSError:
+                self.sock.close()
+                self.sock = None
+                if time.monotonic() > deadline:
+                    registry.stop(self.role)
+                    raise RuntimeError("Timed out waiting for VLC control socket")
+                time.sleep(0.05)
+
+        self.buffer = b""
+        self._read_response(deadline)
+        logger.info(f"VLC player {self.name} ready (PID: {self.process.pid})")
+
+    def _read_response(self, deadline):
+        """Read from the control socket until the next RC prompt"""
+        while True:
+            if self.buffer.startswith(self.PROMPT):
+                self.buffer = self.buffer[len(self.PROMPT):]
+                return ""
+            index = self.buffer.find(b"\n" + self.PROMPT)
+            if index != -1:
+                response = self.buffer[:index]
+                self.buffer = self.buffer[index + 1 + len(self.PROMPT):]
+                return response.decode(errors="replace").strip()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Timed out waiting for VLC response")
+            self.sock.settimeout(remaining)
+            data = self.sock.recv(4096)
+            if not data:
+                raise ConnectionError("VLC closed the control socket")
+            self.buffer += data
+
+    def command(self, cmd, timeout=2.0):
+        """Send an RC command to VLC and return its response"""
+        with trace_span(f"vlc {cmd.split()[0]}", "ack", player=self.name), self.lock:
+            if self.sock is None:
+                raise ConnectionError("VLC player is not connected")
+            try:
+                self.sock.sendall(cmd.encode() + b"\n")
+                return self._read_response(time.monotonic() + timeout)
+            except OSError:
+                # A late reply would be taken for the next command's, so
+                # drop the connection and let ensure_player() restart VLC
+                self.close()
+                raise
+
+    def load(self, video_path):
+        """Replace the current media with video_path, held paused on its first frame
+
+        The item repeats with :input-repeat rather than relying on --loop,
+        because a playlist loop would re-open it paused again.
+        """
+        self.media = video_path
+        self.window = self.stage_window
+        self.cancel_frame_watch()
+        self.command("clear")
+        self.command(f"add {Path(video_path).resolve().as_uri()} :start-paused :input-repeat=65535")
+
+    def resume(self):
+        """Resume paused playback"""
+        self.command("play")
+
+    def get_state(self):
+        """Return VLC's input state (playing, paused, stopped, ...)"""
+        match = re.search(r"\( state (\w+) \)", self.command("status"))
+        return match.group(1) if match else "stopped"
+
+    def wait_for_state(self, state, timeout=5.0):
+        """Wait until VLC reports the given input state"""
+        deadline = time.monotonic() + timeout
+        while self.get_state() != state:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for VLC to be {state}")
+            time.sleep(0.005)
+
+    def frames_displayed(self):
+        """Return the number of frames displayed for the current input
+        
+        VLC only refreshes the count every VLC_STATS_INTERVAL, so it can
+        lag the screen by that much.
+        """
+        match = re.search(r"frames displayed\s*:\s*(\d+)", self.command("stats"))
+        return int(match.group(1)) if match else 0
+
+    def set_volume(self, level):
+        """Set VLC's own output volume (0.0-1.0), independent of the mixer"""
+        self.command(f"volume {round(256 * level)}")
+
+    def find_window(self, timeout=2.0):
+        """Look up the X window of VLC's video output"""
+        if self.window is None:
+            self.window = find_process_window(self.process.pid, timeout)
+            if self.window is None:
+                logger.warning(f"VLC {self.name} video window not found")
+        return self.window
+
+    def stop(self):
+        """Stop playback without stopping the VLC process"""
+        self.media = None
+        self.window = self.stage_window
+        self.cancel_frame_watch()
+        self.command("stop")
+        self.command("clear")
+    
+    def cancel_frame_watch(self):
+        """Stop waiting for the stage window to change, the media it was for is gone"""
+        if self.frame_watch is not None:
+            stage.cancel_damage(self.frame_watch)
+            self.frame_watch = None
+
+    def _request_quit(self):
+        try:
+            with self.lock:
+                if self.sock is None:
+                    raise ConnectionError("VLC player is not connected")
+                self.sock.sendall(b"quit\n")
+        except OSError:
+            signal_process_group(self.process, signal.SIGTERM)
+
+    def shutdown(self):
+        """Ask VLC to quit, killing it if it does not exit in time"""
+        if registry.get(self.role) is self.process:
+            registry.stop(self.role, request_exit=self._request_quit)
+        self.close()
+
+    def close(self):
+        """Close the control socket"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.buffer = b""
+
+def terminate_process(process, name, request_exit=None):
+    """Stop a child process and return how long it took, in seconds
+
+    The wait returns as soon as the child exits; SIGKILL is only sent if
+    it is still running after stop_timeout.
+    """
+    start_time = time.monotonic()
+    if process.poll() is None:
+        if request_exit is None:
+            signal_process_group(process, signal.SIGTERM)
+        else:
+            request_exit()
+        try:
+            process.wait(timeout=stop_timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{name} did not exit within {stop_timeout:.1f} s, forcing kill")
+            signal_process_group(process, signal.SIGKILL)
+            process.wait()
+    elapsed = time.monotonic() - start_time
+    logger.info(f"{name} stopped in {elapsed * 1000:.1f} ms")
+    return elapsed
+
+def signal_process_group(process, sig):
+    """Send a signal to a child's whole process group"""
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        # Not a group leader (or the group is gone), signal the child itself
+        try:
+            process.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
+class ChildRegistry:
+    """Owns every child process PiOSC starts, at most one per role
+
+    Each child gets its own process group so stopping it also stops
+    anything it spawned, and the supervisor reaps it as soon as it exits.
+    """
+
+    def __init__(self):
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def spawn(self, role, args, on_exit=None, on_line=None, **popen_kwargs):
+        """Start the child for a role, replacing any existing one
+
+        on_exit is called with the process if it exits on its own, but not
+        when it is stopped through the registry.
+        """
+        self.stop(role)
+        with trace_span("spawn", "spawn", role=role):
+            process = subprocess.Popen(args, start_new_session=True, **popen_kwargs)
+        with self.lock:
+            self.children[role] = process
+        supervisor.watch(process, role, on_exit=functools.partial(self._exited, role, on_exit),
+                         on_line=on_line)
+        logger.debug("Started %s with PID: %s", role, process.pid)
+        history.record("spawn", name=role, pid=process.pid)
+        child_spawns.inc(role)
+        return process
+
+    def get(self, role):
+        """Return the running child for a role, or None"""
+        with self.lock:
+            process = self.children.get(role)
+        if process is not None and process.poll() is None:
+            return process
+        return None
+
+    def stop(self, role, request_exit=None):
+        """Stop the child for a role, if any"""
+        with self.lock:
+            process = self.children.pop(role, None)
+        if process is not None:
+            terminate_process(process, role, request_exit)
+
+    def _exited(self, role, on_exit, process):
+        with self.lock:
+            owned = self.children.get(role) is process
+            if owned:
+                del self.children[role]
+        if owned and on_exit is not None:
+            on_exit(process)
+
+    def shutdown(self):
+        """Tear every child down in parallel, killing stragglers at the stop deadline"""
+        start_time = time.monotonic()
+        with self.lock:
+            children = list(self.children.items())
+            self.children.clear()
+        
+        for role, process in children:
+            if process.poll() is None:
+                signal_process_group(process, signal.SIGTERM)
+        
+        deadline = start_time + stop_timeout
+        for role, process in children:
+            try:
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{role} did not exit within {stop_timeout:.1f} s, forcing kill")
+                signal_process_group(process, signal.SIGKILL)
+                process.wait()
+            # Take down anything the child left behind in its group
+            signal_process_group(process, signal.SIGKILL)
+        
+        logger.info(f"Stopped {len(children)} child processes in "
+                    f"{(time.monotonic() - start_time) * 1000:.1f} ms")
+
+registry = ChildRegistry()
+
+def find_process_window(pid, timeout=2.0):
+    """Wait for a process to show a visible X window and return its ID, or None"""
+    if find_tool("xdotool") is None:
+        return None
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = subprocess.run(["xdotool", "search", "--onlyvisible", "--pid", str(pid)],
+                                    env=VLC_ENV, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    text=True)
+        except Exception as e:
+            logger.warning(f"Could not look up window of PID {pid}: {e}")
+            return None
+        windows = result.stdout.split()
+        if windows:
+            return windows[-1]
+        if time.monotonic() > deadline:
+            return None
+        time.sleep(0.02)
+
+def ensure_player(slot):
+    """Return the persistent VLC player for a slot, (re)starting it if needed"""
+    current_player = players[slot]
+    if current_player is None or not current_player.is_alive() or current_player.sock is None:
+        if current_player is not None:
+            state = "not responding" if current_player.is_alive() else "not running"
+            logger.warning(f"VLC player {current_player.name} is {state}, restarting it")
+            current_player.shutdown()
+        current_stage = open_stage()
+        current_player = VLCPlayer(SLOT_NAMES[slot], current_stage.window(slot) if current_stage else None)
+        with trace_span("start player", "spawn", player=current_player.name):
+            current_player.start()
+        players[slot] = current_player
+    return current_player
+
+# X11 window attribute masks and window class (see X.h)
+CW_BACK_PIXEL = 1 << 1
+CW_OVERRIDE_REDIRECT = 1 << 9
+X_INPUT_OUTPUT = 1
+XA_CARDINAL = 6
+PROP_MODE_REPLACE = 0
+
+# DAMAGE extension report level and event (see Xdamage.h)
+XDAMAGE_REPORT_NON_EMPTY = 3
+XDAMAGE_NOTIFY = 0
+
+class XSetWindowAttributes(ctypes.Structure):
+    _fields_ = [
+        ("background_pixmap", ctypes.c_ulong),
+        ("background_pixel", ctypes.c_ulong),
+        ("border_pixmap", ctypes.c_ulong),
+        ("border_pixel", ctypes.c_ulong),
+        ("bit_gravity", ctypes.c_int),
+        ("win_gravity", ctypes.c_int),
+        ("backing_store", ctypes.c_int),
+        ("backing_planes", ctypes.c_ulong),
+        ("backing_pixel", ctypes.c_ulong),
+        ("save_under", ctypes.c_int),
+        ("event_mask", ctypes.c_long),
+        ("do_not_propagate_mask", ctypes.c_long),
+        ("override_redirect", ctypes.c_int),
+        ("colormap", ctypes.c_ulong),
+        ("cursor", ctypes.c_ulong),
+    ]
+
+class XDamageNotifyEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("drawable", ctypes.c_ulong),
+        ("damage", ctypes.c_ulong),
+        ("level", ctypes.c_int),
+        ("more", ctypes.c_int),
+        ("timestamp", ctypes.c_ulong),
+    ]
+
+class XEvent(ctypes.Union):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("damage", XDamageNotifyEvent),
+        ("pad", ctypes.c_long * 24),
+    ]
+
+X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+@X_ERROR_HANDLER
+def x_error_handler(display, event):
+    # Xlib's default handler exits the process, which must not happen mid-show
+    logger.warning("X error on a player window")
+    return 0
+
+def find_library(name):
+    """Return the file name of a shared library, or None if it isn't installed"""
+    # ctypes.util is only needed once a library is loaded, so it is
+    # imported here to keep it out of the time to the OSC port listening
+    import ctypes.util
+    return ctypes.util.find_library(name)
+
+@functools.lru_cache(maxsize=None)
+def load_xlib():
+    """Load libX11 for the stage windows, or return None if it isn't installed"""
+    path = find_library("X11")
+    if path is None:
+        return None
+    xlib = ctypes.CDLL(path)
+    xlib.XOpenDisplay.restype = ctypes.c_void_p
+    xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    for name in ("XDefaultScreen", "XFlush", "XConnectionNumber", "XPending"):
+        getattr(xlib, name).argtypes = [ctypes.c_void_p]
+    xlib.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(XEvent)]
+    for name in ("XRootWindow", "XBlackPixel"):
+        getattr(xlib, name).restype = ctypes.c_ulong
+        getattr(xlib, name).argtypes = [ctypes.c_void_p, ctypes.c_int]
+    for name in ("XDisplayWidth", "XDisplayHeight"):
+        getattr(xlib, name).argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XCreateWindow.restype = ctypes.c_ulong
+    xlib.XCreateWindow.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+                                   ctypes.c_uint, ctypes.c_uint, ctypes.c_uint, ctypes.c_int,
+                                   ctypes.c_uint, ctypes.c_void_p, ctypes.c_ulong,
+                                   ctypes.POINTER(XSetWindowAttributes)]
+    for name in ("XMapWindow", "XRaiseWindow", "XLowerWindow"):
+        getattr(xlib, name).argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    xlib.XInternAtom.restype = ctypes.c_ulong
+    xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    xlib.XChangeProperty.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong,
+                                     ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    xlib.XDeleteProperty.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong]
+    xlib.XSetErrorHandler.argtypes = [X_ERROR_HANDLER]
+    xlib.XSetErrorHandler.restype = ctypes.c_void_p
+    return xlib
+
+@functools.lru_cache(maxsize=None)
+def load_xdamage():
+    """Load libXdamage to see when the stage windows change, or return None if it isn't installed"""
+    path = find_library("Xdamage")
+    if path is None:
+        return None
+    xdamage = ctypes.CDLL(path)
+    xdamage.XDamageQueryExtension.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int),
+                                              ctypes.POINTER(ctypes.c_int)]
+    xdamage.XDamageCreate.restype = ctypes.c_ulong
+    xdamage.XDamageCreate.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int]
+    xdamage.XDamageDestroy.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    return xdamage
+
+class Stage:
+    """Full-screen X windows the VLC players draw into, stacked by PiOSC
+    
+    Each player renders into its own override-redirect window through
+    VLC's --drawable-xid instead of opening a full-screen window itself.
+    Window managers leave such windows where they are put, so a standby
+    player's window sits at the bottom of the stack, under the black
+    screen, from before VLC draws into it until GO raises it. An armed
+    frame is never on stage early, whether or not anything is live.
+    """
+    
+    def __init__(self, xlib, display):
+        self.xlib = xlib
+        self.display = display
+        self.screen = xlib.XDefaultScreen(display)
+        self.opacity_atom = xlib.XInternAtom(display, b"_NET_WM_WINDOW_OPACITY", 0)
+        self.windows = {}
+        self.lock = threading.Lock()
+        self.xdamage = None
+        self.damage_display = None  # Own connection, so damage events don't queue up on the main one
+        self.damage_event = None    # Event code of XDamageNotify on damage_display
+        self.damage_checked = False
+        self.damage_watches = {}    # Damage object -> future waiting for it
+        self.damage_lock = threading.Lock()
+    
+    def window(self, slot):
+        """Return the window of a player slot, creating it at the bottom of the stack"""
+        xlib = self.xlib
+        with self.lock:
+            if slot not in self.windows:
+                attributes = XSetWindowAttributes(background_pixel=xlib.XBlackPixel(self.display, self.screen),
+                                                  override_redirect=1)
+                window = xlib.XCreateWindow(
+                    self.display, xlib.XRootWindow(self.display, self.screen), 0, 0,
+                    xlib.XDisplayWidth(self.display, self.screen), xlib.XDisplayHeight(self.display, self.screen),
+                    0, 0, X_INPUT_OUTPUT, None, CW_BACK_PIXEL | CW_OVERRIDE_REDIRECT, ctypes.byref(attributes))
+                # Restacked before it is mapped, so it never shows on top
+                xlib.XLowerWindow(self.display, window)
+                xlib.XMapWindow(self.display, window)
+                xlib.XFlush(self.display)
+                self.windows[slot] = window
+            return self.windows[slot]
+    
+    def raise_window(self, window):
+        """Put a window on top of everything, the window manager's windows included"""
+        with self.lock:
+            self.xlib.XRaiseWindow(self.display, window)
+            self.xlib.XFlush(self.display)
+    
+    def lower_window(self, window):
+        """Put a window under everything, the black screen included"""
+        with self.lock:
+            self.xlib.XLowerWindow(self.display, window)
+            self.xlib.XFlush(self.display)
+    
+    def watch_damage(self, window):
+        """Return a future set to the time.monotonic() a window's contents next change
+        
+        The X server reports drawing into the window, VLC's video output
+        included, as it happens, so the time is when the picture changed
+        rather than when VLC's statistics caught up. Returns None if the
+        server has no DAMAGE extension.
+        """
+        with self.damage_lock:
+            if not self._start_damage():
+                return None
+            damage = self.xdamage.XDamageCreate(self.damage_display, window, XDAMAGE_REPORT_NON_EMPTY)
+            # Only flushed: the request reaches the server well before VLC,
+            # told to play after this, can draw anything
+            self.xlib.XFlush(self.damage_display)
+            future = concurrent.futures.Future()
+            self.damage_watches[damage] = future
+            return future
+    
+    def cancel_damage(self, future):
+        """Stop watching for the change a watch_damage() future is waiting for"""
+        with self.damage_lock:
+            for damage, watch in list(self.damage_watches.items()):
+                if watch is future:
+                    self._destroy_damage(damage)
+            future.cancel()
+    
+    def _start_damage(self):
+        if self.damage_checked:
+            return self.damage_display is not None
+        self.damage_checked = True
+        
+        xdamage = load_xdamage()
+        display = self.xlib.XOpenDisplay(VLC_ENV["DISPLAY"].encode()) if xdamage else None
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        if not display or not xdamage.XDamageQueryExtension(display, ctypes.byref(event_base),
+                                                            ctypes.byref(error_base)):
+            logger.warning("X DAMAGE extension unavailable, first frames will be timed from VLC's statistics")
+            return False
+        self.xdamage = xdamage
+        self.damage_display = display
+        self.damage_event = event_base.value + XDAMAGE_NOTIFY
+        threading.Thread(target=self._read_damage, name="stage-damage", daemon=True).start()
+        return True
+    
+    def _read_damage(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.xlib.XConnectionNumber(self.damage_display), selectors.EVENT_READ)
+        event = XEvent()
+        while True:
+            # Events Xlib read in passing don't wake the selector, so poll too
+            selector.select(FIRST_FRAME_POLL)
+            while self.xlib.XPending(self.damage_display):
+                self.xlib.XNextEvent(self.damage_display, ctypes.byref(event))
+                changed_time = time.monotonic()
+                if event.type != self.damage_event:
+                    continue
+                with self.damage_lock:
+                    future = self.damage_watches.get(event.damage.damage)
+                    if future is not None:
+                        self._destroy_damage(event.damage.damage)
+                        if future.set_running_or_notify_cancel():
+                            future.set_result(changed_time)
+    
+    def _destroy_damage(self, damage):
+        del self.damage_watches[damage]
+        self.xdamage.XDamageDestroy(self.damage_display, damage)
+        self.xlib.XFlush(self.damage_display)
+    
+    def set_opacity(self, window, opacity):
+        """Set a window's opacity for the compositor, 1.0 removing the property"""
+        with self.lock:
+            if opacity >= 1.0:
+                self.xlib.XDeleteProperty(self.display, window, self.opacity_atom)
+            else:
+                # Format 32 properties are passed as C longs, whatever their size
+                value = ctypes.c_ulong(int(max(0.0, opacity) * 0xFFFFFFFF))
+                self.xlib.XChangeProperty(self.display, window, self.opacity_atom, XA_CARDINAL, 32,
+                                          PROP_MODE_REPLACE, ctypes.byref(value), 1)
+            self.xlib.XFlush(self.display)
+
+def open_stage():
+    """Open the X display for the stage windows, or return None to let VLC open its own"""
+    global stage, stage_checked
+    
+    with stage_lock:
+        if stage_checked:
+            return stage
+        stage_checked = True
+        
+        xlib = load_xlib()
+        if xlib is None:
+            logger.warning("libX11 not found, players will open their own windows and an armed cue may show before GO")
+            return None
+        xlib.XInitThreads()
+        display = xlib.XOpenDisplay(VLC_ENV["DISPLAY"].encode())
+        if not display:
+            logger.warning(f"Could not open X display {VLC_ENV['DISPLAY']}, players will open their own windows "
+                           f"and an armed cue may show before GO")
+            return None
+        xlib.XSetErrorHandler(x_error_handler)
+        stage = Stage(xlib, display)
+        return stage
+
+def raise_player(current_player):
+    """Bring a player's picture to the top of the screen"""
+    if current_player.stage_window is not None:
+        stage.raise_window(current_player.stage_window)
+    elif current_player.window:
+        x_window_command("xdotool", "windowraise", current_player.window)
+
+def lower_player(current_player):
+    """Send a player's picture under everything else, the black screen included"""
+    if current_player.stage_window is not None:
+        stage.lower_window(current_player.stage_window)
+    elif current_player.window:
+        x_window_command("xdotool", "windowlower", current_player.window)
+
+def x_window_command(*args):
+    """Run an xdotool/xprop window command, logging failures"""
+    if find_tool(args[0]) is None:
+        return  # Reported by preflight()
+    try:
+        subprocess.run(args, env=VLC_ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+    except Exception as e:
+        logger.warning(f"Window command {args[0]} failed: {e}")
+
+def set_player_opacity(current_player, opacity):
+    """Set the opacity of a player's picture (needs a compositing window manager)"""
+    if current_player.stage_window is not None:
+        # Set directly through Xlib, a crossfade does this 25 times a second
+        stage.set_opacity(current_player.stage_window, opacity)
+    elif not current_player.window:
+        return
+    elif opacity >= 1.0:
+        x_window_command("xprop", "-id", str(current_player.window), "-remove", "_NET_WM_WINDOW_OPACITY")
+    else:
+        x_window_command("xprop", "-id", str(current_player.window), "-f", "_NET_WM_WINDOW_OPACITY", "32c",
+                         "-set", "_NET_WM_WINDOW_OPACITY", str(int(opacity * 0xFFFFFFFF)))
+
+def run_crossfade(outgoing, incoming, duration, outgoing_level=1.0):
+    """Fade the incoming player in over the outgoing one, then stop the outgoing
+    
+    outgoing_level is the outgoing player's volume to fade down from,
+    lower than 1.0 if it was partway through a fade-out.
+    """
+    steps = max(1, int(duration * CROSSFADE_RATE))
+    try:
+        for step in range(1, steps + 1):
+            if crossfade_cancel.wait(duration / steps):
+                break
+            level = step / steps
+            set_player_opacity(incoming, level)
+            incoming.set_volume(level)
+            outgoing.set_volume(outgoing_level * (1.0 - level))
+    except Exception as e:
+        logger.error(f"Error during crossfade: {e}")
+    finally:
+        try:
+            set_player_opacity(incoming, 1.0)
+            incoming.set_volume(1.0)
+            outgoing.stop()
+            lower_player(outgoing)
+            outgoing.set_volume(1.0)
+        except Exception as e:
+            logger.error(f"Error finishing crossfade: {e}")
+
+def finish_crossfade():
+    """Complete any running crossfade immediately"""
+    global crossfade_thread
+    
+    if crossfade_thread is not None:
+        crossfade_cancel.set()
+        crossfade_thread.join()
+        crossfade_thread = None
+        crossfade_cancel.clear()
+
+@functools.lru_cache(maxsize=None)
+def load_libc():
+    """Load the C library for the syscalls the standard library doesn't wrap"""
+    libc = ctypes.CDLL(find_library("c"), use_errno=True)
+    libc.mmap.restype = ctypes.c_void_p
+    libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int,
+                          ctypes.c_int, ctypes.c_long]
+    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+    return libc
+
+# inotify event masks (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+class MediaIndex:
+    """In-memory index of the video directory, kept current with inotify
+
+    Names are resolved without touching the disk, trying in turn an exact
+    relative path, a case-insensitive match, a match without the extension
+    and finally a unique prefix.
+    """
+
+    WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+                  IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.files = set()   # Relative POSIX paths of every indexed file
+        self.lookup = (frozenset(), {}, {}, [])  # files, lowercase, stem and sorted lowercase keys
+        self.watches = {}    # inotify watch descriptor -> relative directory
+        self.inotify_fd = None
+        self.listeners = []  # Called with (full path, added) on every change
+
+    def build(self):
+        """Scan the video directory and start watching it for changes"""
+        start_time = time.monotonic()
+        self._start_inotify()
+        self._scan("")
+        self._rebuild_lookup()
+        # Only read events once the scan is done, so the supervisor thread
+        # never changes the index under it; the kernel queues them meanwhile
+        if self.inotify_fd is not None:
+            supervisor.add_reader(self.inotify_fd, self._read_events)
+        logger.info(f"Indexed {len(self.files)} media files in "
+                    f"{(time.monotonic() - start_time) * 1000:.1f} ms")
+
+    def resolve(self, name):
+        """Return the full path for a media name, or None if it is not in the index"""
+        files, lowercase, stems, sorted_keys = self.lookup
+        relative_path = str(PurePosixPath(name)).lstrip("/")
+        if relative_path in files:
+            return self.root / relative_path
+        
+        key = relative_path.lower()
+        candidates = lowercase.get(key) or stems.get(key)
+        if candidates is None:
+            # Unique prefix match
+            candidates = []
+            index = bisect.bisect_left(sorted_keys, key)
+            while index < len(sorted_keys) and sorted_keys[index].startswith(key) and len(candidates) < 2:
+                candidates.extend(lowercase[sorted_keys[index]])
+                index += 1
+        
+        if len(candidates) == 1:
+            return self.root / candidates[0]
+        if len(candidates) > 1:
+            logger.warning(f"Media name {name!r} is ambiguous: {sorted(candidates)}")
+        elif self.inotify_fd is None and (self.root / relative_path).is_file():
+            # Without inotify the index can go stale, so fall back to the disk
+            self._add(relative_path)
+            self._rebuild_lookup()
+            return self.root / relative_path
+        return None
+
+    def _start_inotify(self):
+        try:
+            libc = load_libc()
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable, the media index will not follow changes: {e}")
+            return
+        self.libc = libc
+        self.inotify_fd = fd
+
+    def _watch(self, relative_dir):
+        if self.inotify_fd is None:
+            return
+        path = str(self.root / relative_dir).encode()
+        wd = self.libc.inotify_add_watch(self.inotify_fd, path, self.WATCH_MASK)
+        if wd < 0:
+            logger.warning(f"Could not watch {path.decode()}: {os.strerror(ctypes.get_errno())}")
+        else:
+            self.watches[wd] = relative_dir
+
+    def _scan(self, relative_dir, notify=True):
+        self._watch(relative_dir)
+        try:
+            entries = list(os.scandir(self.root / relative_dir))
+        except OSError as e:
+            logger.warning(f"Could not scan {self.root / relative_dir}: {e}")
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                self._scan(relative_path, notify)
+            elif entry.is_file():
+                self._add(relative_path, notify)
+    
+    def _rescan(self):
+        """Rebuild the index from disk and notify only the files that came or went"""
+        old_files = set(self.files)
+        self.files.clear()
+        self.watches.clear()
+        self._scan("", notify=False)
+        for relative_path in sorted(old_files - self.files):
+            self._notify(relative_path, False)
+        for relative_path in sorted(self.files - old_files):
+            self._notify(relative_path, True)
+    
+    def _add(self, relative_path, notify=True):
+        self.files.add(relative_path)
+        if notify:
+            self._notify(relative_path, True)
+
+    def _remove(self, relative_path):
+        if relative_path in self.files:
+            self.files.discard(relative_path)
+            self._notify(relative_path, False)
+
+    def _notify(self, relative_path, added):
+        for listener in self.listeners:
+            try:
+                listener(self.root / relative_path, added)
+            except Exception as e:
+                logger.error(f"Error in media index listener: {e}")
+
+    def _rebuild_lookup(self):
+        lowercase = {}
+        stems = {}
+        for relative_path in self.files:
+            lowercase.setdefault(relative_path.lower(), []).append(relative_path)
+            stem = str(PurePosixPath(relative_path).with_suffix("")).lower()
+            stems.setdefault(stem, []).append(relative_path)
+        # Swapped in one assignment so lookups never see a half-built index
+        self.lookup = (frozenset(self.files), lowercase, stems, sorted(lowercase))
+
+    def _read_events(self, fd):
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="surrogateescape")
+            offset += length
+            
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflowed, rescanning video directory")
+                self._rescan()
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            relative_dir = self.watches.get(wd)
+            if relative_dir is None or not name or name.startswith("."):
+                continue
+            relative_path = f"{relative_dir}/{name}" if relative_dir else name
+            
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._scan(relative_path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    for indexed in [f for f in self.files if f.startswith(relative_path + "/")]:
+                        self._remove(indexed)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._add(relative_path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._remove(relative_path)
+        self._rebuild_lookup()
+
+def probe_media(video_path):
+    """Probe a media file with ffprobe and return a dict of its properties"""
+    result = subprocess.run(["ffprobe", "-v", "error", "-print_format", "json",
+                             "-show_format", "-show_streams", str(video_path)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+    data = json.loads(result.stdout)
+    streams = data.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), {})
+    
+    fps = 0.0
+    numerator, _, denominator = video.get("avg_frame_rate", "0/0").partition("/")
+    if denominator and float(denominator):
+        fps = float(numerator) / float(denominator)
+    
+    # Keyframe interval from the packet flags of the first 30 seconds
+    keyframe_interval = 0.0
+    if video:
+        result = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0",
+                                 "-read_intervals", "%+30", "-show_entries", "packet=pts_time,flags",
+                                 "-of", "csv=p=0", str(video_path)],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        keyframes = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                keyframes.append(float(pts_time))
+        if len(keyframes) > 1:
+            keyframe_interval = (keyframes[-1] - keyframes[0]) / (len(keyframes) - 1)
+    
+    return {
+        "duration": float(data.get("format", {}).get("duration") or 0),
+        "bitrate": int(data.get("format", {}).get("bit_rate") or 0),
+        "video_codec": video.get("codec_name", ""),
+        "audio_codec": audio.get("codec_name", ""),
+        "width": int(video.get("width") or 0),
+        "height": int(video.get("height") or 0),
+        "fps": round(fps, 3),
+        "keyframe_interval": round(keyframe_interval, 3),
+    }
+
+def playback_problems(info):
+    """List the reasons a probed file may not play smoothly on the Pi"""
+    problems = []
+    if info["video_codec"] and info["video_codec"] not in PROFILE_CODECS:
+        problems.append(f"{info['video_codec']} video is not hardware-friendly")
+    if info["height"] > profile_max_height:
+        problems.append(f"{info['width']}x{info['height']} is above {profile_max_height}p")
+    if info["fps"] > profile_max_fps:
+        problems.append(f"{info['fps']:g} fps is above {profile_max_fps} fps")
+    if info["bitrate"] > profile_max_bitrate:
+        problems.append(f"{info['bitrate'] / 1e6:.1f} Mbps is above {profile_max_bitrate / 1e6:g} Mbps")
+    return problems
+
+class ProbeCache:
+    """Media metadata from ffprobe, cached on disk and keyed by path, size and mtime
+
+    Files are probed in a background pool so a large library doesn't hold
+    up startup; the cache is written back once the queue drains.
+    """
+
+    SAVE_EVERY = 50  # Also save after this many probes while the queue is busy
+
+    def __init__(self, path=PROBE_CACHE_PATH):
+        self.path = Path(path)
+        self.entries = {}  # Absolute path -> {"size", "mtime_ns", "info"}
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=PROBE_WORKERS,
+                                                              thread_name_prefix="probe")
+        self.queued = set()
+        self.verified = set()  # Entries checked against the file since startup
+        self.unsaved = 0
+        self.available = find_tool("ffprobe") is not None
+        self.listeners = []  # Called with (path, info) once a file's metadata is current
+
+    def load(self):
+        """Load the cache from disk"""
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+            logger.info(f"Loaded {len(self.entries)} cached media probes")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable probe cache {self.path}: {e}")
+
+    def save(self):
+        """Write the cache to disk atomically"""
+        with self.lock:
+            data = json.dumps(self.entries)
+            self.unsaved = 0
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            temp_path.write_text(data)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"Error saving probe cache: {e}")
+
+    def get(self, video_path):
+        """Return the cached metadata for a file, or None if it is not known to be current
+
+        Entries are only trusted once a probe worker has checked them against
+        the file, which happens again whenever the media index sees a change.
+        """
+        key = str(video_path)
+        with self.lock:
+            if key not in self.verified:
+                return None
+            return self.entries[key]["info"]
+
+    def submit(self, video_path):
+        """Queue a file to be probed in the background if its cache entry is stale"""
+        key = str(video_path)
+        with self.lock:
+            if not self.available or key in self.queued:
+                return
+            self.queued.add(key)
+            self.verified.discard(key)
+        self.executor.submit(self._probe, video_path)
+
+    def forget(self, video_path):
+        """Drop the cache entry of a removed file"""
+        with self.lock:
+            self.verified.discard(str(video_path))
+            if self.entries.pop(str(video_path), None) is not None:
+                self.unsaved += 1
+
+    def _probe(self, video_path):
+        key = str(video_path)
+        try:
+            stat = os.stat(video_path)
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                info = probe_media(video_path)
+                with self.lock:
+                    self.entries[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "info": info}
+                    self.unsaved += 1
+                logger.debug("Probed %s: %s", video_path, info)
+            with self.lock:
+                self.verified.add(key)
+                info = self.entries[key]["info"]
+            for listener in self.listeners:
+                listener(video_path, info)
+        except FileNotFoundError as e:
+            if e.filename == "ffprobe":
+                with self.lock:
+                    if self.available:
+                        logger.warning("ffprobe not found, media will not be probed")
+                    self.available = False
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            logger.warning(f"Could not probe {video_path}: {e}")
+        finally:
+            with self.lock:
+                self.queued.discard(key)
+                should_save = self.unsaved and (not self.queued or self.unsaved >= self.SAVE_EVERY)
+            if should_save:
+                self.save()
+
+PROT_READ = 0x1
+MAP_SHARED = 0x01
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+def page_residency(video_path, length=None):
+    """Return the fraction of a file's first length bytes (default all) in the page cache
+
+    Uses mmap + mincore(2), which only inspects the page cache and never
+    reads the file.
+    """
+    libc = load_libc()
+    fd = os.open(video_path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        length = size if length is None else min(length, size)
+        if length == 0:
+            return 1.0
+        address = libc.mmap(None, length, PROT_READ, MAP_SHARED, fd, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            raise OSError(ctypes.get_errno(), "mmap failed")
+        try:
+            pages = (length + PAGE_SIZE - 1) // PAGE_SIZE
+            vector = (ctypes.c_ubyte * pages)()
+            if libc.mincore(address, length, vector) != 0:
+                raise OSError(ctypes.get_errno(), "mincore failed")
+            return sum(page & 1 for page in vector) / pages
+        finally:
+            libc.munmap(address, length)
+    finally:
+        os.close(fd)
+
+class Preloader:
+    """Warms the page cache for upcoming cues within a memory budget
+
+    The head of each file (enough for PRELOAD_SECONDS at its bitrate) and
+    its tail, where MP4s may keep their index, are requested with
+    posix_fadvise(WILLNEED) so the kernel reads them ahead in the background.
+    When the budget is exceeded the least recently used files are released.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.warm = collections.OrderedDict()  # Path -> bytes advised, oldest first
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="preload")
+
+    def preload(self, video_path):
+        """Queue a file to be read into the page cache"""
+        self.executor.submit(self._preload, Path(video_path))
+
+    def touch(self, video_path):
+        """Mark a file as recently used so it is evicted last"""
+        # Queued behind pending preloads so the order of calls is kept
+        self.executor.submit(self._touch, Path(video_path))
+
+    def _touch(self, video_path):
+        with self.lock:
+            if video_path in self.warm:
+                self.warm.move_to_end(video_path)
+
+    def warm_files(self):
+        """Return the preloaded files and their advised sizes, oldest first"""
+        with self.lock:
+            return list(self.warm.items())
+
+    def _ranges(self, video_path, size):
+        info = probe_cache.get(video_path) if probe_cache else None
+        if info and info["bitrate"]:
+            head = int(info["bitrate"] / 8 * PRELOAD_SECONDS) + PRELOAD_TAIL_BYTES
+        else:
+            head = PRELOAD_DEFAULT_BYTES
+        head = min(size, head, self.budget_bytes)
+        tail = min(PRELOAD_TAIL_BYTES, size - head)
+        return [(0, head)] + ([(size - tail, tail)] if tail > 0 else [])
+
+    def _preload(self, video_path):
+        try:
+            start_time = time.monotonic()
+            fd = os.open(video_path, os.O_RDONLY)
+            try:
+                ranges = self._ranges(video_path, os.fstat(fd).st_size)
+                for offset, length in ranges:
+                    os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+            advised = sum(length for _, length in ranges)
+            with self.lock:
+                self.warm[video_path] = advised
+                self.warm.move_to_end(video_path)
+                evicted = []
+                while sum(self.warm.values()) > self.budget_bytes and len(self.warm) > 1:
+                    evicted.append(self.warm.popitem(last=False)[0])
+            logger.debug("Preloading %.1f MB of %s (advised in %.1f ms)",
+                         advised / 1e6, video_path.name, (time.monotonic() - start_time) * 1000)
+            for evicted_path in evicted:
+                self._release(evicted_path)
+        except OSError as e:
+            logger.warning(f"Could not preload {video_path}: {e}")
+
+    def _release(self, video_path):
+        try:
+            fd = os.open(video_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+            logger.debug("Released %s from the page cache", video_path.name)
+        except OSError as e:
+            logger.debug(f"Could not release {video_path}: {e}")
+
+class RamCache:
+    """Copies of hot cues in a RAM-backed tmpfs, evicted least recently used first
+
+    Playing a cached copy takes the SD card or USB stick out of the cue's
+    read path entirely. Copies are made in the background and dropped as
+    soon as the media index sees the original change.
+    """
+
+    def __init__(self, directory, capacity_bytes):
+        self.directory = Path(directory)
+        self.capacity_bytes = capacity_bytes
+        self.entries = collections.OrderedDict()  # Source path -> (cached path, size), oldest first
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="ram-cache")
+
+    def reset(self):
+        """Empty the cache directory, removing copies left by a previous run"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def lookup(self, video_path):
+        """Return the cached copy of a file, or None"""
+        with self.lock:
+            entry = self.entries.get(video_path)
+            if entry is None:
+                return None
+            self.entries.move_to_end(video_path)
+            return entry[0]
+
+    def add(self, video_path):
+        """Queue a file to be copied into the cache"""
+        self.executor.submit(self._add, Path(video_path))
+
+    def discard(self, video_path):
+        """Drop the cached copy of a file"""
+        with self.lock:
+            entry = self.entries.pop(video_path, None)
+        if entry is not None:
+            self._unlink(entry[0])
+
+    def used_bytes(self):
+        """Return the number of bytes held in the cache"""
+        with self.lock:
+            return sum(size for _, size in self.entries.values())
+
+    def _add(self, video_path):
+        with self.lock:
+            if video_path in self.entries:
+                self.entries.move_to_end(video_path)
+                return
+        try:
+            size = os.path.getsize(video_path)
+            if size > self.capacity_bytes:
+                logger.warning(f"{video_path.name} ({size / 1e6:.0f} MB) is larger than the RAM cache")
+                return
+            
+            # Make room first so the copy never pushes tmpfs over the cap
+            evicted = []
+            with self.lock:
+                while self.entries and sum(s for _, s in self.entries.values()) + size > self.capacity_bytes:
+                    evicted.append(self.entries.popitem(last=False))
+            for source, (cached_path, _) in evicted:
+                logger.info(f"Evicting {source.name} from the RAM cache")
+                self._unlink(cached_path)
+            
+            start_time = time.monotonic()
+            digest = hashlib.sha1(str(video_path).encode()).hexdigest()[:16]
+            cached_path = self.directory / f"{digest}{video_path.suffix}"
+            temp_path = cached_path.with_name(f".{cached_path.name}.tmp")
+            shutil.copyfile(video_path, temp_path)
+            os.replace(temp_path, cached_path)
+            with self.lock:
+                self.entries[video_path] = (cached_path, size)
+            logger.info(f"Cached {video_path.name} in RAM ({size / 1e6:.1f} MB in "
+                        f"{time.monotonic() - start_time:.1f} s)")
+        except OSError as e:
+            logger.error(f"Could not cache {video_path} in RAM: {e}")
+
+    def _unlink(self, cached_path):
+        try:
+            cached_path.unlink()
+        except FileNotFoundError:
+            pass
+
+def load_show_file(show_file):
+    """Read a show file: one cue name per line, # starts a comment
+
+    A leading + marks a hot cue to keep in the RAM cache. Returns the cue
+    names in order and the list of hot cue names.
+    """
+    cues = []
+    hot_cues = []
+    with open(show_file) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line.startswith("+"):
+                line = line[1:].strip()
+                if line:
+                    hot_cues.append(line)
+            if line:
+                cues.append(line)
+    return cues, hot_cues
+
+def preload_upcoming(video_path):
+    """Preload the cues that follow video_path in the show file"""
+    global show_position
+    
+    if preloader is None or not show_cues:
+        return
+    
+    # Find the cue in the show, searching forward from the last one so repeats work
+    for offset in range(len(show_cues)):
+        position = (show_position + offset) % len(show_cues)
+        if media_index.resolve(show_cues[position]) == video_path:
+            show_position = position
+            break
+    else:
+        return
+    
+    # Farthest first, so under a tight budget the nearest cues are evicted last
+    for name in reversed(show_cues[show_position + 1:show_position + 1 + preload_count]):
+        upcoming = media_index.resolve(name)
+        if upcoming is not None:
+            preloader.preload(upcoming)
+
+def preload_video(video_filename):
+    """Preload a video into the page cache on request"""
+    video_path = media_index.resolve(video_filename)
+    if video_path is None:
+        logger.error(f"Video file not found: {Path(video_directory) / video_filename}")
+        return
+    logger.info(f"Preloading video: {video_path}")
+    preloader.preload(video_path)
+
+def report_residency(client_address, video_filename=None):
+    """Reply with how much of a video (default: every preloaded one) is in the page cache"""
+    if video_filename is None:
+        entries = preloader.warm_files()
+    else:
+        video_path = media_index.resolve(video_filename)
+        if video_path is None:
+            send_reply(client_address, "/residency/error", video_filename)
+            return
+        entries = [(video_path, None)]
+    
+    for video_path, advised in entries:
+        try:
+            whole = page_residency(video_path)
+            head = page_residency(video_path, advised) if advised else whole
+        except OSError as e:
+            logger.warning(f"Could not check page cache residency of {video_path}: {e}")
+            continue
+        logger.info(f"{video_path.name}: {head * 100:.0f}% of preload window "
+                    f"and {whole * 100:.0f}% of file in page cache")
+        send_reply(client_address, "/residency",
+                   str(video_path.relative_to(media_index.root)), round(head * 100, 1), round(whole * 100, 1))
+
+def media_fingerprint(video_path):
+    """Return a content fingerprint of a file: its size plus samples of its start, middle and end"""
+    digest = hashlib.sha256()
+    with open(video_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        digest.update(str(size).encode())
+        for offset in (0, max(0, size // 2 - FINGERPRINT_SAMPLE // 2), max(0, size - FINGERPRINT_SAMPLE)):
+            f.seek(offset)
+            digest.update(f.read(FINGERPRINT_SAMPLE))
+    return digest.hexdigest()
+
+class Transcoder:
+    """Background pool that normalizes media outside the playback profile
+
+    Transcodes run niced and ionice'd so they never compete with playback,
+    and land in a cache addressed by the source's content fingerprint and
+    the profile, so renaming or copying a file doesn't transcode it again.
+    """
+
+    def __init__(self, directory, workers):
+        self.directory = Path(directory)
+        self.outputs = {}   # Source path -> normalized path
+        self.queued = set()
+        self.progress = {}  # Source path -> fraction done, for running transcodes
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                              thread_name_prefix="transcode")
+
+    def lookup(self, video_path):
+        """Return the normalized version of a file, or None"""
+        with self.lock:
+            return self.outputs.get(video_path)
+
+    def consider(self, video_path, info):
+        """Queue a probed file for transcoding if it is outside the playback profile"""
+        with self.lock:
+            self.outputs.pop(video_path, None)
+            if not playback_problems(info) or video_path in self.queued:
+                return
+            self.queued.add(video_path)
+        self.executor.submit(self._transcode, video_path, info)
+
+    def forget(self, video_path):
+        """Stop using the normalized version of a removed file"""
+        with self.lock:
+            self.outputs.pop(video_path, None)
+
+    def status(self):
+        """Return (queue depth, {source path: fraction done} for running transcodes)"""
+        with self.lock:
+            return len(self.queued) - len(self.progress), dict(self.progress)
+
+    def _profile_key(self):
+        return f"{PROFILE_CODECS[0]}:{profile_max_height}:{profile_max_fps}:{profile_max_bitrate}"
+
+    def _command(self, video_path, info, output_path):
+        filters = [f"scale=-2:'min({profile_max_height},ih)'"]
+        if info["fps"] > profile_max_fps:
+            filters.append(f"fps={profile_max_fps}")
+        return [
+            "nice", "-n", "19", "ionice", "-c", "3",
+            "ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "error", "-y",
+            "-i", str(video_path),
+            "-map", "0:v:0", "-map", "0:a?",
+            "-vf", ",".join(filters),
+            "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "high", "-pix_fmt", "yuv420p",
+            "-maxrate", str(profile_max_bitrate), "-bufsize", str(profile_max_bitrate * 2),
+            "-c:a", "aac", "-b:a", "192k",
+            "-movflags", "+faststart", "-f", "mp4",
+            "-progress", "pipe:1", "-nostats",
+            str(output_path),
+        ]
+
+    def _transcode(self, video_path, info):
+        try:
+            fingerprint = hashlib.sha256(
+                f"{media_fingerprint(video_path)}:{self._profile_key()}".encode()).hexdigest()
+            output_path = self.directory / f"{fingerprint}.mp4"
+            if not output_path.exists():
+                self.directory.mkdir(parents=True, exist_ok=True)
+                temp_path = self.directory / f".{fingerprint}.tmp"
+                logger.info(f"Transcoding {video_path.name}: {', '.join(playback_problems(info))}")
+                start_time = time.monotonic()
+                with self.lock:
+                    self.progress[video_path] = 0.0
+                process = registry.spawn(f"transcode-{fingerprint[:12]}",
+                                         self._command(video_path, info, temp_path),
+                                         on_line=functools.partial(self._progress, video_path, info["duration"]),
+                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                if process.wait() != 0:
+                    logger.error(f"Transcoding {video_path.name} failed with code {process.returncode}")
+                    temp_path.unlink(missing_ok=True)
+                    return
+                os.replace(temp_path, output_path)
+                logger.info(f"Transcoded {video_path.name} in {time.monotonic() - start_time:.0f} s")
+            with self.lock:
+                self.outputs[video_path] = output_path
+        except OSError as e:
+            logger.error(f"Could not transcode {video_path}: {e}")
+        finally:
+            with self.lock:
+                self.queued.discard(video_path)
+                self.progress.pop(video_path, None)
+
+    def _progress(self, video_path, duration, stream, line):
+        key, _, value = line.partition("=")
+        if stream == "stdout" and key == "out_time_us" and duration > 0 and value.isdigit():
+            with self.lock:
+                if video_path in self.progress:
+                    self.progress[video_path] = min(1.0, int(value) / 1e6 / duration)
+
+def prepare_cue(video_filename):
+    """Resolve a video and do the per-cue setup, returning its path or None"""
+    # Resolve the name against the in-memory index, without touching the disk
+    video_path = media_index.resolve(video_filename)
+    if video_path is None:
+        logger.error(f"Video file not found: {Path(video_directory) / video_filename}")
+        return None
     
-    # Try to find the appropriate control
-    for control in controls:
-        if "'Master'" in control:
-            return "Master"
-        elif "'PCM'" in control:
-            return "PCM"
-        elif "'Speaker'" in control:
-            return "Speaker"
+    # Warn about files the Pi may not decode smoothly
+    info = probe_cache.get(video_path) if probe_cache else None
+    if info and not (transcoder and transcoder.lookup(video_path)):
+        for problem in playback_problems(info):
+            logger.warning(f"{video_path.name}: {problem}")
     
-    # Default to PCM if no known control is found
-    logger.warning("Could not identify volume control, defaulting to PCM")
-    return "PCM"
+    # Start reading ahead the cues after this one, keeping this one warmest
+    if preloader is not None:
+        preload_upcoming(video_path)
+        preloader.touch(video_path)
+    
+    # Play the normalized version of out-of-profile media once it is ready
+    normalized_path = transcoder.lookup(video_path) if transcoder else None
+    if normalized_path is not None:
+        logger.info("Using transcoded version of %s", video_path.name)
+        video_path = normalized_path
+    
+    # Play from RAM if this is a hot cue
+    cached_path = ram_cache.lookup(video_path) if ram_cache else None
+    if cached_path is not None:
+        logger.info("Using RAM cached copy of %s", video_path.name)
+        video_path = cached_path
+    
+    return video_path
 
-# Get the volume control to use
-VOLUME_CONTROL = get_volume_control()
-logger.info(f"Using volume control: {VOLUME_CONTROL}")
+def play_video(video_filename):
+    """Play a video file, swapping it in without a black gap"""
+    logger.info("Playing video: %s", video_filename)
+    if cue_video(video_filename):
+        go_video()
 
-def set_system_volume(volume_percent):
-    """Set the system volume using amixer"""
-    try:
-        # Ensure volume is within valid range
-        volume_percent = max(0, min(100, volume_percent))
-        
-        # Run amixer command to set volume
-        cmd = ['amixer', 'set', VOLUME_CONTROL, f'{volume_percent}%']
-        logger.info(f"Running volume command: {' '.join(cmd)}")
-        
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.returncode == 0:
-            logger.info(f"Volume set to {volume_percent}%")
-            return True
-        else:
-            logger.error(f"Error setting volume: {result.stderr}")
-            return False
-    except Exception as e:
-        logger.error(f"Exception while setting volume: {e}")
+def cue_video(video_filename):
+    """Load a video paused on its first frame in the standby slot, ready for go_video()"""
+    global armed_cue
+    
+    with trace_span("resolve", "resolve", file=video_filename):
+        video_path = prepare_cue(video_filename)
+    if video_path is None:
         return False
-
-def get_system_volume():
-    """Get the current system volume"""
+    
+    logger.info("Arming cue: %s", video_path)
+    armed_cue = None
+    
+    # Until a crossfade ends, the standby slot is the player still fading
+    # out, and its end would stop whatever was loaded into it meanwhile
+    finish_crossfade()
+    
     try:
-        result = subprocess.run(['amixer', 'get', VOLUME_CONTROL], 
-                               stdout=subprocess.PIPE, 
-                               stderr=subprocess.PIPE, 
-                               text=True)
+        start_time = time.monotonic()
+        standby = ensure_player(1 - live_slot)
+        standby.load(video_path)
+        loaded_time = time.monotonic()
+        if command_received is not None:
+            cue_load_latency.observe(loaded_time - command_received)
+        with trace_span("first frame decoded", "player", player=standby.name):
+            standby.wait_for_state("paused")
+        cue_first_frame_latency.observe(time.monotonic() - loaded_time)
+        # The held frame is on display even if the stats don't count it yet
+        standby.armed_frames = max(1, standby.frames_displayed())
         
-        # Parse the output to get the volume percentage
-        output = result.stdout
-        if "%" in output:
-            volume_str = output[output.find("[")+1:output.find("%")]
-            return int(volume_str)
+        # A stage window has been at the bottom of the stack all along.
+        # Without one, VLC mapped its own window on top, so push it back
+        # under the live picture and the black screen as soon as it's found
+        if standby.stage_window is None and standby.find_window():
+            lower_player(standby)
+            live = players[live_slot]
+            if live is not None and live.window:
+                raise_player(live)
         
-        logger.warning(f"Could not parse volume from output: {output}")
-        return 80  # Default if we can't determine
+        armed_cue = video_path
+        arm_ms = (time.monotonic() - start_time) * 1000
+        logger.info("Cue armed on player %s in %.1f ms: %s", standby.name, arm_ms, video_path)
+        history.record("cue", player=standby.name, path=str(video_path), arm_ms=round(arm_ms, 1))
+        return True
     except Exception as e:
-        logger.error(f"Error getting system volume: {e}")
-        return 80  # Default if error
+        logger.error(f"Error arming cue in VLC: {e}")
+        return False
 
-def play_video(video_filename):
-    """Play a video file using VLC"""
-    global current_process, current_volume
-    
-    # Kill any existing video playback
-    stop_video()
+def go_video(fade=None):
+    """Swap the armed standby player on screen, optionally crossfading"""
+    global armed_cue, live_slot, crossfade_thread
     
-    # Full path to the video
-    video_path = Path(video_directory) / video_filename
-    
-    # Check if file exists
-    if not video_path.is_file():
-        logger.error(f"Video file not found: {video_path}")
-        return
+    if armed_cue is None:
+        logger.warning("GO received but no cue is armed")
+        return False
     
-    logger.info(f"Playing video: {video_path}")
+    if fade is None:
+        fade = crossfade_seconds
     
-    # Get the current system volume
-    current_volume = get_system_volume()
+    go_time = time.monotonic()
+    finish_crossfade()
     
-    # First hide the mouse cursor
-    try:
-        subprocess.run(["unclutter", "-display", ":0", "-idle", "0.1", "-root"], 
-                      env=VLC_ENV, check=False)
-    except Exception as e:
-        logger.warning(f"Could not hide cursor: {e}")
+    # The cue taking over ends a fade-out of the outgoing player
+    stop_fade = volume_ramp.cancel("stop")
     
     try:
-        # Start VLC with appropriate settings for Raspberry Pi 5
-        current_process = subprocess.Popen([
-            VLC_PATH,
-            "--fullscreen",            # Full screen mode
-            "--no-video-title-show",   # Don't show video title
-            "--loop",                  # Loop VLC when playback ends
-            "--no-osd",                # No on-screen display
-            "--video-on-top",          # Keep video on top
-            "--key-quit", "Ctrl+c",    # Change quit key to reduce accidental exits
-            "--mouse-hide-timeout=1",  # Hide mouse cursor quickly
-            "--vout", "x11",           # Use X11 video output for Pi 5
-            video_path
-        ], env=VLC_ENV, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        incoming = ensure_player(1 - live_slot)
+        outgoing = players[live_slot]
+        outgoing_active = outgoing is not None and outgoing.media is not None
+        
+        if fade > 0 and outgoing_active:
+            set_player_opacity(incoming, 0.0)
+            incoming.set_volume(0.0)
         
-        logger.debug(f"VLC process started with PID: {current_process.pid}")
+        # Watch the stage window for the cue's picture before it can change
+        if incoming.stage_window is not None:
+            incoming.frame_watch = stage.watch_damage(incoming.stage_window)
         
-        # Start a thread to monitor the VLC output
-        threading.Thread(target=monitor_vlc_output, args=(current_process,), daemon=True).start()
+        # The incoming frame is already decoded, so unpausing and raising
+        # its window replaces the picture in one step with no black gap
+        incoming.resume()
+        raise_player(incoming)
+        live_slot = 1 - live_slot
+        logger.info("GO on player %s: %s", incoming.name, armed_cue)
+        history.record("go", player=incoming.name, path=str(armed_cue), fade=fade)
+        
+        # Time the first new frame on screen without holding up the queue
+        threading.Thread(target=track_first_frame, name="first-frame", daemon=True,
+                         args=(incoming, armed_cue, command_received or go_time,
+                               getattr(trace_context, "trace_id", None))).start()
+        armed_cue = None
+        
+        if outgoing_active:
+            if fade > 0:
+                # Carry on from where an interrupted fade-out had got to
+                outgoing_level = stop_fade.level if stop_fade is not None else 1.0
+                crossfade_thread = threading.Thread(target=run_crossfade, daemon=True,
+                                                    args=(outgoing, incoming, fade, outgoing_level))
+                crossfade_thread.start()
+            else:
+                outgoing.stop()
+                lower_player(outgoing)
+                if stop_fade is not None:
+                    outgoing.set_volume(1.0)
+        return True
     except Exception as e:
-        logger.error(f"Error starting VLC: {e}")
+        logger.error(f"Error starting armed cue: {e}")
+        return False
+
+def wait_for_first_frame(current_player, video_path, timeout=FIRST_FRAME_TIMEOUT):
+    """Wait for a resumed player's picture to change after GO
+    
+    Returns the time.monotonic() the new frame was seen, or None if the
+    media was stopped or replaced first, or nothing was rendered in time.
+    With a stage window the X server reports the change as it is drawn.
+    Otherwise the frame count comes from VLC's statistics, which are
+    refreshed every VLC_STATS_INTERVAL rather than per frame, so the time
+    is late by up to that plus FIRST_FRAME_POLL. Polling faster would only
+    load the RC socket, which the crossfade and fade-out share.
+    """
+    frame_watch = current_player.frame_watch
+    if frame_watch is not None:
+        try:
+            shown_time = frame_watch.result(timeout)
+        except concurrent.futures.CancelledError:
+            return None  # Stopped or replaced
+        except concurrent.futures.TimeoutError:
+            stage.cancel_damage(frame_watch)
+            logger.warning("Player %s drew nothing within %g s of GO", current_player.name, timeout)
+            return None
+        return shown_time if current_player.media == video_path else None
+    
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if current_player.frames_displayed() > current_player.armed_frames:
+                return time.monotonic()
+        except OSError:
+            return None  # VLC went away
+        if current_player.media != video_path:
+            return None
+        if time.monotonic() > deadline:
+            logger.warning("Player %s rendered no new frame within %g s of GO", current_player.name, timeout)
+            return None
+        time.sleep(FIRST_FRAME_POLL)
+
+def first_frame_resolution(current_player):
+    """Return how late wait_for_first_frame() can see a player's first frame, in seconds"""
+    if current_player.frame_watch is not None:
+        return STAGE_FRAME_RESOLUTION
+    return VLC_STATS_INTERVAL + FIRST_FRAME_POLL
+
+def track_first_frame(current_player, video_path, received, trace_id=None):
+    """Record how long after its OSC message a cue's first new frame was rendered
+    
+    The player's window is raised by GO, so the picture changes with the
+    first thing VLC draws after resuming, which the stage window's damage
+    reports or, without one, VLC's frame counter shows.
+    """
+    resolution = first_frame_resolution(current_player)
+    shown_time = wait_for_first_frame(current_player, video_path)
+    if shown_time is None:
+        return
+    latency = shown_time - received
+    cue_on_screen_latency.observe(latency)
+    if tracer and trace_id is not None:
+        tracer.add("on screen", "player", received, shown_time, trace_id, player=current_player.name)
+    logger.info("First frame of %s on screen %.0f ms after the OSC message (to within %.0f ms)",
+                Path(video_path).name, latency * 1000, resolution * 1000)
+    history.record("first_frame", player=current_player.name, path=str(video_path), ms=round(latency * 1000, 1))
 
 def volume_up():
     """Increase volume"""
-    global current_volume
-    
-    # Get current system volume
-    current_volume = get_system_volume()
+    # Step from where the mixer is headed, not where it happens to be
+    level = settle_volume()
     
     # Increase volume by step amount
-    new_volume = min(100, current_volume + volume_step)
-    logger.info(f"Increasing volume from {current_volume}% to {new_volume}%")
+    new_volume = min(100, level + volume_step)
+    logger.info("Increasing volume from %s%% to %s%%", level, new_volume)
     
-    if set_system_volume(new_volume):
-        current_volume = new_volume
-        return True
-    
-    return False
+    volume_writer.request(new_volume)
+    return True
 
 def volume_down():
     """Decrease volume"""
-    global current_volume
-    
-    # Get current system volume
-    current_volume = get_system_volume()
+    # Step from where the mixer is headed, not where it happens to be
+    level = settle_volume()
     
     # Decrease volume by step amount
-    new_volume = max(0, current_volume - volume_step)
-    logger.info(f"Decreasing volume from {current_volume}% to {new_volume}%")
-    
-    if set_system_volume(new_volume):
-        current_volume = new_volume
-        return True
+    new_volume = max(0, level - volume_step)
+    logger.info("Decreasing volume from %s%% to %s%%", level, new_volume)
     
-    return False
+    volume_writer.request(new_volume)
+    return True
 
 def volume_set(value):
     """Set volume to a specific value (0-100)"""
-    global current_volume
-    
     # Validate volume value
     try:
         value = int(value)
@@ -227,37 +2643,178 @@ def volume_set(value):
         logger.warning(f"Invalid volume value: {value}")
         return False
     
-    logger.info(f"Setting volume to {value}%")
+    logger.debug("Setting volume to %s%%", value)
+    volume_ramp.cancel("mixer")
+    volume_writer.request(value)
+    return True
+
+def settle_volume():
+    """Cancel any volume fade and return the level the mixer is headed for (0-100)"""
+    with trace_span("volume read", "volume"):
+        fade = volume_ramp.cancel("mixer")
+        if fade is not None:
+            return round(fade.level * 100)
+        pending = volume_writer.target()
+        return pending if pending is not None else current_volume
+
+def apply_mixer_level(level):
+    """Write one step of a volume fade (0.0-1.0) to the system volume"""
+    global current_volume
     
-    if set_system_volume(value):
-        current_volume = value
-        return True
+    percent = round(level * 100)
+    if percent == current_volume and volume_writer.target() is None:
+        return
     
-    return False
+    # The native mixer is cheap enough to follow every tick; amixer goes
+    # through the volume writer, which limits how often it runs
+    if open_mixer() is not None:
+        current_volume = percent
+        set_system_volume(percent)
+    else:
+        volume_writer.request(percent)
 
-def monitor_vlc_output(process):
-    """Monitor VLC output for errors"""
-    while process.poll() is None:
-        output = process.stdout.readline()
-        if output:
-            logger.debug(f"VLC output: {output.decode().strip()}")
-        
-        error = process.stderr.readline()
-        if error:
-            logger.warning(f"VLC error: {error.decode().strip()}")
-        
-        time.sleep(0.1)
+def volume_fade(value, seconds):
+    """Fade the system volume to a value (0-100) over a number of seconds"""
+    try:
+        value = int(value)
+        seconds = float(seconds)
+        if value < 0 or value > 100 or seconds < 0:
+            logger.warning(f"Invalid volume fade: {value}% over {seconds} s")
+            return False
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid volume fade: {value}, {seconds}")
+        return False
+    
+    start = settle_volume()
+    logger.info("Fading volume from %s%% to %s%% over %g s", start, value, seconds)
+    history.record("volume_fade", start=start, level=value, seconds=seconds)
+    # amixer and alsaaudio spread the percentage over the control's raw
+    # range, which on the Pi's controls is already in dB, so a linear
+    # sweep of the percentage is the even-sounding one
+    volume_ramp.start("mixer", apply_mixer_level, start / 100, value / 100, seconds,
+                      on_done=lambda: logger.info("Volume fade to %s%% finished", value),
+                      curve=linear_curve)
+    return True
+
+def fade_out_video(seconds):
+    """Fade out the live player's audio, then stop playback"""
+    previous = volume_ramp.cancel()
+    live = players[live_slot]
+    fading_out = previous is not None and previous.name == "stop"
+    
+    if seconds <= 0 or live is None or live.media is None:
+        stop_video()
+        if fading_out and live is not None:
+            live.set_volume(1.0)
+        return
+    
+    finish_crossfade()
+    logger.info("Fading out player %s over %g s", live.name, seconds)
+    history.record("fade_out", player=live.name, seconds=seconds)
+    volume_ramp.start("stop", live.set_volume, previous.level if fading_out else 1.0, 0.0, seconds,
+                      on_done=functools.partial(command_executor.submit, finish_fade_out, live))
+
+def finish_fade_out(player):
+    """Stop the faded player once a fade-out has reached silence
+    
+    Only that player is stopped: a cue armed on the standby player during
+    the fade stays armed for the next GO.
+    """
+    # A cue that went live meanwhile owns the screen now, so leave it be
+    if players[live_slot] is player:
+        logger.info("Fade-out finished, stopping player %s", player.name)
+        try:
+            player.stop()
+            lower_player(player)
+        except Exception as e:
+            logger.error(f"Error stopping VLC playback: {e}")
+        history.record("stop", player=player.name)
+        show_black_screen()
+    player.set_volume(1.0)
+
+def watch_mixer():
+    """Read the volume once, then follow mixer events to keep current_volume fresh
+    
+    current_volume is the source of truth for volume_up/down, so reading it
+    is free; changes made outside PiOSC (alsamixer, another app) still come
+    in through the events.
+    """
+    global current_volume
+    current_volume = get_system_volume()
+    logger.info(f"System volume: {current_volume}%")
+    
+    # With alsaaudio, the mixer's own poll descriptors signal changes
+    if open_mixer() is not None and hasattr(mixer, "handle_events"):
+        for fd, _ in mixer.polldescriptors():
+            supervisor.add_reader(fd, mixer_changed)
+        return
+    
+    # Otherwise follow control events from alsactl and re-read on each one
+    if find_tool("alsactl") is None:
+        return  # Reported by preflight()
+    card = [str(audio_card)] if audio_card is not None else []
+    registry.spawn("mixer-monitor", ["alsactl", "monitor", *card],
+                   on_exit=lambda process: logger.warning("Mixer monitor exited, outside volume changes won't be noticed"),
+                   on_line=mixer_event,
+                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def mixer_changed(fd):
+    """Handle pending alsaaudio mixer events, on the supervisor thread"""
+    with mixer_lock:
+        mixer.handle_events()
+        level = int(mixer.getvolume()[0])
+    sync_volume(level)
+
+def mixer_event(stream, line):
+    """Handle one line of `alsactl monitor` output"""
+    if volume_control() not in line:
+        return
+    
+    # Our own writes come back as events too; they're already cached
+    if volume_writer.target() is not None or time.monotonic() - volume_writer.last_write < 0.5:
+        return
+    sync_volume(get_system_volume())
+
+def sync_volume(level):
+    """Take a volume level read back from the mixer into current_volume"""
+    global current_volume
+    
+    # Ignore our own writes in flight, and the off-by-one that the
+    # percent to raw to percent round trip can introduce
+    if volume_writer.target() is not None or abs(level - current_volume) <= 1:
+        return
+    logger.info(f"Volume changed outside PiOSC: {current_volume}% -> {level}%")
+    history.record("volume", level=level, previous=current_volume, source="mixer")
+    current_volume = level
+
+def start_cursor_hider(process=None):
+    """Start the unclutter daemon that hides the mouse pointer, restarting it if it dies"""
+    if process is not None:
+        if not is_running:
+            return
+        logger.warning(f"Cursor hider exited with code {process.returncode}, "
+                       f"restarting in {CURSOR_RESTART_DELAY:.0f} s")
+        timer = threading.Timer(CURSOR_RESTART_DELAY, start_cursor_hider)
+        timer.daemon = True
+        timer.start()
+        return
     
-    return_code = process.poll()
-    logger.info(f"VLC process ended with return code: {return_code}")
+    if find_tool("unclutter") is None:
+        return  # Reported by preflight()
+    try:
+        registry.spawn("cursor", ["unclutter", "-display", ":0", "-idle", "0.1", "-root"],
+                       on_exit=start_cursor_hider, env=VLC_ENV,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        logger.info("Cursor hider started")
+    except Exception as e:
+        logger.warning(f"Could not hide cursor: {e}")
 
 def create_black_screen():
     """Create a simple black screen using feh (image viewer)"""
     try:
         # Create a black image file in temp directory
-        temp_dir = Path.home() / ".cache" / "piosc"
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        black_image_path = temp_dir / "black.png"
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        black_image_path = CACHE_DIR / "black.png"
         
         if not black_image_path.exists():
             logger.info("Creating black image")
@@ -266,7 +2823,7 @@ def create_black_screen():
                 f.write(bytes.fromhex("89504e470d0a1a0a0000000d4948445200000001000000010100000000376ef9240000001049444154789c6260000000000000000000ffff03000006000557bfabd40000000049454e44ae426082"))
         
         # Use feh to display the black image fullscreen
-        return subprocess.Popen([
+        return registry.spawn("black-screen", [
             "feh", 
             "--fullscreen",
             "--hide-pointer",
@@ -278,77 +2835,458 @@ def create_black_screen():
 
 def stop_video():
     """Stop any currently playing video and show black screen"""
-    global current_process
-    
-    # Kill any existing video playback
-    if current_process and current_process.poll() is None:
-        logger.info(f"Stopping video playback (PID: {current_process.pid})")
-        current_process.terminate()
-        # Give it a moment to terminate gracefully
-        time.sleep(0.5)
-        # Force kill if still running
-        if current_process.poll() is None:
-            logger.warning(f"Process did not terminate gracefully, forcing kill")
-            current_process.kill()
-        current_process = None
+    global armed_cue
+    
+    armed_cue = None
+    
+    finish_crossfade()
+    
+    # Stop playback but keep the VLC processes running for the next cue
+    start_time = time.monotonic()
+    for current_player in players:
+        if current_player is not None and current_player.is_alive():
+            logger.info("Stopping video playback on player %s (PID: %s)",
+                        current_player.name, current_player.process.pid)
+            try:
+                current_player.stop()
+            except Exception as e:
+                logger.error(f"Error stopping VLC playback: {e}")
+    stop_ms = (time.monotonic() - start_time) * 1000
+    logger.info("Playback stopped in %.1f ms", stop_ms)
+    history.record("stop", stop_ms=round(stop_ms, 1))
+    stop_latency.observe(stop_ms / 1000)
+    show_black_screen()
+
+def show_black_screen():
+    """Start the black screen behind the players unless it is already up"""
+    # The black screen sits behind VLC, so it only needs starting once
+    if registry.get("black-screen") is not None:
+        return
     
     # Display black screen using feh (image viewer) - simpler and more reliable
+    if find_tool("feh") is None:
+        return  # Reported by preflight()
+    black_screen = create_black_screen()
+    if black_screen:
+        logger.info(f"Black screen displayed with PID: {black_screen.pid}")
+    else:
+        logger.error("Failed to display black screen")
+
+def shutdown_children():
+    """Tear down the VLC players and every other child process"""
+    finish_crossfade()
+    registry.shutdown()
+    for current_player in players:
+        if current_player is not None:
+            current_player.close()
+
+def update_probe_cache(video_path, added):
+    """Media index listener that keeps the probe cache in step with the directory"""
+    if added:
+        probe_cache.submit(video_path)
+    else:
+        probe_cache.forget(video_path)
+
+def update_transcoder(video_path, added):
+    """Media index listener that stops using transcodes of changed or removed files"""
+    transcoder.forget(video_path)
+
+def transcode_status(client_address):
+    """Reply with the transcode queue depth and the progress of running transcodes"""
+    queued, progress = transcoder.status() if transcoder else (0, {})
+    send_reply(client_address, "/transcode/status", queued, len(progress))
+    for video_path, done in progress.items():
+        send_reply(client_address, "/transcode/progress",
+                   str(video_path.relative_to(media_index.root)), round(done * 100, 1))
+
+def update_ram_cache(video_path, added):
+    """Media index listener that drops RAM copies of changed or removed files"""
+    ram_cache.discard(video_path)
+
+def report_history(client_address, limit):
+    """Reply with the most recent events, oldest first"""
+    events = history.recent(limit)
+    send_reply(client_address, "/history", len(events), history.count)
+    for timestamp, kind, fields in events:
+        # OSC floats are 32-bit, too coarse for a Unix time, so send it as text
+        clock = f"{time.strftime('%H:%M:%S', time.localtime(timestamp))}.{int(timestamp % 1 * 1000):03d}"
+        send_reply(client_address, "/history/event", clock, kind, json.dumps(fields, default=str))
+
+def dump_history(client_address, filename=None):
+    """Write the event history to a JSONL file in the background and reply with its path
+    
+    The file always goes in HISTORY_DUMP_DIR: the name comes from an
+    unauthenticated UDP packet, so it may not point anywhere else.
+    """
+    if filename is None:
+        filename = f"history-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+    if not filename or filename != Path(filename).name or filename.startswith("."):
+        logger.warning(f"Refusing history dump to {filename!r}, only a plain file name is allowed")
+        send_reply(client_address, "/history/dump/error", filename)
+        return
+    path = HISTORY_DUMP_DIR / filename
+    
+    def write():
+        try:
+            HISTORY_DUMP_DIR.mkdir(parents=True, exist_ok=True)
+            history.dump(path)
+            logger.info(f"Wrote event history to {path}")
+            send_reply(client_address, "/history/dump", str(path))
+        except OSError as e:
+            logger.error(f"Could not write event history to {path}: {e}")
+            send_reply(client_address, "/history/dump/error", str(path))
+    
+    threading.Thread(target=write, name="history-dump", daemon=True).start()
+
+def render_metrics():
+    """Return every metric and the process gauges in the Prometheus text format"""
+    lines = []
+    for metric in all_metrics:
+        lines.extend(metric.render())
+    
+    # Process gauges are read from /proc when scraped, so they cost nothing in between
+    with open("/proc/self/statm") as f:
+        rss = int(f.read().split()[1]) * PAGE_SIZE
+    with open("/proc/self/status") as f:
+        threads = next((int(line.split()[1]) for line in f if line.startswith("Threads:")), 0)
+    gauges = (
+        ("piosc_resident_memory_bytes", "Resident set size of the PiOSC process", rss),
+        ("piosc_open_fds", "Open file descriptors", len(os.listdir("/proc/self/fd"))),
+        ("piosc_threads", "Threads in the PiOSC process", threads),
+    )
+    for name, description, value in gauges:
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+def start_metrics_server(ip, port):
+    """Serve /metrics over HTTP from a background thread"""
+    # http.server pulls in http.client and email, about 20 ms of imports
+    # that only --metrics-port needs, so it isn't imported at the top
+    import http.server
+    
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        """Serves GET /metrics for Prometheus"""
+        
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            logger.debug("Metrics request from %s: %s", self.client_address[0], format % args)
+    
+    server = http.server.ThreadingHTTPServer((ip, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Metrics available at http://{ip}:{port}/metrics")
+    return server
+
+def cache_video(video_filename):
+    """Copy a video into the RAM cache on request"""
+    if ram_cache is None:
+        logger.warning("RAM cache is disabled")
+        return
+    video_path = media_index.resolve(video_filename)
+    if video_path is None:
+        logger.error(f"Video file not found: {Path(video_directory) / video_filename}")
+        return
+    logger.info(f"Caching video in RAM: {video_path}")
+    ram_cache.add((transcoder and transcoder.lookup(video_path)) or video_path)
+
+def send_reply(client_address, address, *values):
+    """Send an OSC message back to the sender of a query"""
+    if osc_transport is None or client_address is None:
+        return
+    builder = osc_message_builder.OscMessageBuilder(address=address)
+    for value in values:
+        builder.add_arg(value)
+    # The transport belongs to the event loop thread
+    event_loop.call_soon_threadsafe(osc_transport.sendto, builder.build().dgram, client_address)
+
+def media_info(client_address, video_filename):
+    """Reply with the probed metadata of a video"""
+    video_path = media_index.resolve(video_filename)
+    info = probe_cache.get(video_path) if video_path and probe_cache else None
+    if info is None:
+        logger.warning(f"No media info for: {video_filename}")
+        send_reply(client_address, "/info/error", video_filename)
+        return
+    send_reply(client_address, "/info", video_filename, info["duration"], info["width"],
+               info["height"], info["fps"], info["video_codec"])
+
+def enqueue_osc_message(client_address, address, *args):
+    """Queue an OSC message for the command executor
+
+    Called on the event loop for every datagram; commands then run one at
+    a time in arrival order, so two quick /play messages can't race.
+    Volume commands skip the queue and run at once (see run_volume_command).
+    """
+    received = packet_received or time.monotonic()
+    osc_messages.inc(address)
+    trace_id = None
+    if tracer:
+        trace_id = tracer.new_trace()
+        tracer.add("decode", "decode", received, time.monotonic(), trace_id, address=address)
+    
+    # Fader updates are recorded once per burst by the volume writer instead
+    if address != "/volume_set":
+        history.record("osc", address=address, args=list(args), sender=f"{client_address[0]}:{client_address[1]}")
+    
+    if address in VOLUME_COMMANDS:
+        run_volume_command(address, args, trace_id)
+        return
+    
+    command_executor.submit(run_osc_command, client_address, address, args, received,
+                            trace_id, time.monotonic())
+
+def run_volume_command(address, args, trace_id=None):
+    """Run a volume command straight away on the event loop
+    
+    None of them block: they only retarget the volume ramp or hand a level
+    to the volume writer, which keeps just the newest. Running them all
+    here keeps them in arrival order with respect to each other, so a
+    /volume_fade stuck behind a slow cue can't override a fader move sent
+    after it, and fader updates never wait for the command queue.
+    """
+    trace_context.trace_id = trace_id
+    start_time = time.monotonic()
     try:
-        # Make sure feh is installed
-        subprocess.run(["which", "feh"], check=True)
-        current_process = create_black_screen()
-        if current_process:
-            logger.info(f"Black screen displayed with PID: {current_process.pid}")
-        else:
-            logger.error("Failed to display black screen")
-    except subprocess.CalledProcessError:
-        logger.warning("feh not found. Installing...")
-        try:
-            subprocess.run(["sudo", "apt-get", "update", "-qq"], check=True)
-            subprocess.run(["sudo", "apt-get", "install", "-y", "feh", "unclutter"], check=True)
-            logger.info("feh installed")
-            current_process = create_black_screen()
-        except Exception as e:
-            logger.error(f"Failed to install feh: {e}")
-            # Fallback to a simpler approach if feh fails
+        if address == "/volume_set" and len(args) > 0:
             try:
-                logger.info("Trying simpler blank screen approach")
-                current_process = subprocess.Popen([
-                    "xset", "s", "blank", "s", "on"
-                ], env=VLC_ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            except Exception as e2:
-                logger.error(f"All blank screen methods failed: {e2}")
-
-def handle_osc_message(address, *args):
+                volume_set(int(args[0]))
+            except (ValueError, TypeError):
+                logger.warning(f"Invalid volume value: {args}")
+        elif address == "/volume_fade" and len(args) > 1:
+            volume_fade(args[0], args[1])
+        elif address == "/volume_up":
+            volume_up()
+        elif address == "/volume_down":
+            volume_down()
+        else:
+            logger.warning(f"Missing arguments for {address}: {args}")
+    except Exception as e:
+        logger.error(f"Error handling OSC message {address}: {e}")
+        history.record("error", address=address, message=str(e))
+    finally:
+        trace_context.trace_id = None
+        if trace_id is not None:
+            tracer.add(address, "command", start_time, time.monotonic(), trace_id, args=list(args))
+
+def run_osc_command(client_address, address, args, received, trace_id=None, queued=None):
+    """Run one queued OSC command on the command executor"""
+    global command_received
+    
+    command_received = received
+    trace_context.trace_id = trace_id
+    start_time = time.monotonic()
+    if trace_id is not None:
+        # Time spent waiting behind earlier commands
+        tracer.add("dispatch", "dispatch", queued, start_time, trace_id, address=address)
+    try:
+        handle_osc_message(client_address, address, *args)
+    except Exception as e:
+        logger.error(f"Error handling OSC message {address}: {e}")
+        history.record("error", address=address, message=str(e))
+    finally:
+        command_received = None
+        trace_context.trace_id = None
+        if trace_id is not None:
+            tracer.add(address, "command", start_time, time.monotonic(), trace_id, args=list(args))
+
+def handle_osc_message(client_address, address, *args):
     """Generic OSC message handler that logs all incoming messages"""
-    logger.info(f"Received OSC message at address: {address}")
-    logger.info(f"Arguments: {args}")
+    logger.info("Received OSC message %s %s", address, args)
     
     # Extract the command from the address
     command = address.lstrip('/')
     
     if command == "play" and len(args) > 0:
-        video_filename = str(args[0])
-        logger.info(f"Playing video: {video_filename}")
-        play_video(video_filename)
+        play_video(str(args[0]))
+    elif command == "cue" and len(args) > 0:
+        cue_video(str(args[0]))
+    elif command == "go":
+        try:
+            go_video(float(args[0]) if len(args) > 0 else None)
+        except (ValueError, TypeError):
+            logger.warning(f"Invalid crossfade time: {args}")
     elif command == "stop":
+        try:
+            seconds = float(args[0]) if len(args) > 0 else stop_fade_seconds
+        except (ValueError, TypeError):
+            logger.warning(f"Invalid fade time: {args}")
+            seconds = 0.0
         logger.info("Stopping video")
-        stop_video()
-    elif command == "volume_up":
-        logger.info("Increasing volume")
-        volume_up()
-    elif command == "volume_down":
-        logger.info("Decreasing volume")
-        volume_down()
-    elif command == "volume_set" and len(args) > 0:
-        try:
-            vol_level = int(args[0])
-            logger.info(f"Setting volume to: {vol_level}")
-            volume_set(vol_level)
+        fade_out_video(seconds)
+    elif command == "preload" and len(args) > 0:
+        preload_video(str(args[0]))
+    elif command == "cache" and len(args) > 0:
+        cache_video(str(args[0]))
+    elif command == "transcode_status":
+        transcode_status(client_address)
+    elif command == "residency":
+        report_residency(client_address, str(args[0]) if len(args) > 0 else None)
+    elif command == "info" and len(args) > 0:
+        media_info(client_address, str(args[0]))
+    elif command == "history":
+        try:
+            report_history(client_address, int(args[0]) if len(args) > 0 else HISTORY_REPLY_DEFAULT)
         except (ValueError, TypeError):
-            logger.warning(f"Invalid volume value: {args}")
+            logger.warning(f"Invalid history count: {args}")
+    elif command == "history_dump":
+        dump_history(client_address, str(args[0]) if len(args) > 0 else None)
     else:
         logger.warning(f"Unknown command: {command} with args: {args}")
+        unknown_commands.inc()
+
+def benchmark_cue(video_filename, runs):
+    """Measure arm, go-to-first-frame and play-to-first-frame latency for a video"""
+    import statistics  # Only the benchmark needs it
+    arm_times = []
+    first_frame_times = []
+    play_times = []
+    resolution = 0.0
+    
+    for run in range(runs):
+        start_time = time.monotonic()
+        if not cue_video(video_filename):
+            return False
+        arm_times.append((time.monotonic() - start_time) * 1000)
+        
+        current_player = ensure_player(1 - live_slot)
+        start_time = time.monotonic()
+        go_video()
+        resolution = max(resolution, first_frame_resolution(current_player))
+        shown_time = wait_for_first_frame(current_player, current_player.media)
+        if shown_time is None:
+            logger.error("Timed out waiting for the first frame after GO")
+            return False
+        first_frame_times.append((shown_time - start_time) * 1000)
+        stop_video()
+        
+        # The whole of /play, as a cue without a separate /cue sees it
+        current_player = ensure_player(1 - live_slot)
+        start_time = time.monotonic()
+        play_video(video_filename)
+        resolution = max(resolution, first_frame_resolution(current_player))
+        shown_time = wait_for_first_frame(current_player, current_player.media)
+        if shown_time is None:
+            logger.error("Timed out waiting for the first frame after /play")
+            return False
+        play_times.append((shown_time - start_time) * 1000)
+        stop_video()
+    
+    for name, times in (("arm", arm_times), ("go-to-first-frame", first_frame_times),
+                        ("play-to-first-frame", play_times)):
+        print(f"{name}: min {min(times):.1f} ms, median {statistics.median(times):.1f} ms, "
+              f"max {max(times):.1f} ms ({runs} runs)")
+    if resolution > STAGE_FRAME_RESOLUTION:
+        print(f"First frame times are late by up to {resolution * 1000:.0f} ms: "
+              f"VLC only updates its frame count every {VLC_STATS_INTERVAL * 1000:.0f} ms")
+    else:
+        print(f"First frame times are from the X server, late by up to {resolution * 1000:.0f} ms "
+              f"for the display refresh")
+    return True
+
+def seconds_since_launch():
+    """Seconds since this process was started, interpreter startup included"""
+    # Field 22 of /proc/self/stat is the start time in clock ticks since boot
+    with open("/proc/self/stat") as f:
+        start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+    return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+
+def setup_media(args):
+    """Index the video directory and load the caches and show file"""
+    global probe_cache, media_index, transcoder, ram_cache, preloader, show_cues
+    
+    # Index the video directory so cues never have to stat the SD card,
+    # probing new and changed files in the background as they are found
+    probe_cache = ProbeCache()
+    probe_cache.load()
+    media_index = MediaIndex(video_directory)
+    if args.transcode and find_tool("ffmpeg") is not None:
+        transcoder = Transcoder(TRANSCODE_DIR, max(1, args.transcode_workers))
+        probe_cache.listeners.append(transcoder.consider)
+        media_index.listeners.append(update_transcoder)
+    media_index.listeners.append(update_probe_cache)
+    media_index.build()
+    
+    if args.ram_cache > 0:
+        ram_cache = RamCache(RAM_CACHE_DIR, args.ram_cache * 1024 * 1024)
+        ram_cache.reset()
+        media_index.listeners.append(update_ram_cache)
+    
+    # Read the show order so upcoming cues can be preloaded
+    preloader = Preloader(max(1, args.preload_budget) * 1024 * 1024)
+    if args.show_file:
+        try:
+            show_cues, hot_cues = load_show_file(args.show_file)
+            logger.info(f"Loaded {len(show_cues)} cues from show file {args.show_file}")
+            for name in show_cues:
+                if media_index.resolve(name) is None:
+                    logger.warning(f"Show file cue not found in video directory: {name}")
+            for name in show_cues[:preload_count]:
+                if media_index.resolve(name) is not None:
+                    preloader.preload(media_index.resolve(name))
+            
+            # Rebuild the RAM cache of hot cues in the background
+            if ram_cache is not None:
+                for name in hot_cues:
+                    if media_index.resolve(name) is not None:
+                        ram_cache.add(media_index.resolve(name))
+        except OSError as e:
+            logger.error(f"Could not read show file: {e}")
+
+def setup_display(wait_for_window=False):
+    """Prepare the screen and show the black background
+    
+    Returns the time since launch at which the black screen was visible
+    when wait_for_window is set, otherwise None.
+    """
+    # Disable screen blanking/screensaver
+    if find_tool("xset") is not None:
+        try:
+            subprocess.run(["xset", "-dpms"], env=VLC_ENV, check=False)
+            subprocess.run(["xset", "s", "off"], env=VLC_ENV, check=False)
+            subprocess.run(["xset", "s", "noblank"], env=VLC_ENV, check=False)
+            logger.info("Disabled screen blanking/screensaver")
+        except Exception as e:
+            logger.warning(f"Could not disable screen blanking: {e}")
+    
+    # Hide the mouse pointer once for the whole session
+    start_cursor_hider()
+    
+    # Show blank screen at startup
+    stop_video()
+    
+    black_screen = registry.get("black-screen")
+    if wait_for_window and black_screen is not None and find_process_window(black_screen.pid, 5.0):
+        return seconds_since_launch()
+    return None
+
+def wait_for_startup(tasks):
+    """Hold the command queue until the startup tasks have finished"""
+    concurrent.futures.wait(tasks)
+    for task in tasks:
+        if task.exception() is not None:
+            logger.error(f"Startup step failed: {task.exception()}")
+    ready_time = seconds_since_launch()
+    logger.info(f"Startup finished {ready_time * 1000:.0f} ms after launch")
+    history.record("startup", ready_ms=round(ready_time * 1000))
+
+def benchmark_startup(listening_time, black_screen_time, ready_time):
+    """Report how long startup took after launch"""
+    print(f"time-to-listening: {listening_time * 1000:.0f} ms")
+    if black_screen_time is not None:
+        print(f"time-to-black-screen: {black_screen_time * 1000:.0f} ms")
+    else:
+        print("time-to-black-screen: black screen window not found")
+    print(f"time-to-ready: {ready_time * 1000:.0f} ms")
 
 def main():
     parser = argparse.ArgumentParser(description='Video Player for Theatre Show')
@@ -356,12 +3294,54 @@ def main():
     parser.add_argument('--port', type=int, default=DEFAULT_OSC_PORT, help='OSC server port')
     parser.add_argument('--video-dir', default=DEFAULT_VIDEO_DIRECTORY, help='Directory containing video files')
     parser.add_argument('--volume-step', type=int, default=5, help='Volume change step (1-20)')
+    parser.add_argument('--audio-card', help='ALSA card for volume control, by index or name (default: the default card)')
+    parser.add_argument('--audio-control', help='Mixer control for volume (default: Master, PCM or Speaker, whichever exists)')
     parser.add_argument('--log-file', help='Path to log file')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Lowest level of messages to log')
+    parser.add_argument('--stop-timeout', type=float, default=DEFAULT_STOP_TIMEOUT,
+                        help='Seconds a child process gets to exit before it is killed')
+    parser.add_argument('--crossfade', type=float, default=0.0, help='Default crossfade time in seconds for /go and /play')
+    parser.add_argument('--stop-fade', type=float, default=0.0, help='Default audio fade-out time in seconds for /stop')
+    parser.add_argument('--show-file', help='Text file listing the show\'s cues in order, one per line')
+    parser.add_argument('--preload-count', type=int, default=DEFAULT_PRELOAD_COUNT,
+                        help='Number of upcoming show cues to preload')
+    parser.add_argument('--preload-budget', type=int, default=DEFAULT_PRELOAD_BUDGET_MB,
+                        help='Page cache budget for preloading, in MB')
+    parser.add_argument('--ram-cache', type=int, default=DEFAULT_RAM_CACHE_MB,
+                        help=f'Size of the RAM cache for hot cues in {RAM_CACHE_DIR}, in MB (0 disables it)')
+    parser.add_argument('--transcode', action='store_true',
+                        help='Transcode media outside the playback profile in the background')
+    parser.add_argument('--transcode-workers', type=int, default=1, help='Number of parallel transcodes')
+    parser.add_argument('--max-height', type=int, default=DEFAULT_PROFILE_MAX_HEIGHT,
+                        help='Playback profile: maximum video height')
+    parser.add_argument('--max-fps', type=int, default=DEFAULT_PROFILE_MAX_FPS,
+                        help='Playback profile: maximum frame rate')
+    parser.add_argument('--max-bitrate', type=float, default=DEFAULT_PROFILE_MAX_BITRATE_MBPS,
+                        help='Playback profile: maximum bitrate in Mbps')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics over HTTP on this port')
+    parser.add_argument('--metrics-ip', default=DEFAULT_METRICS_IP, help='Address for the metrics server')
+    parser.add_argument('--trace-file', help='Write a Chrome trace of every OSC command to this file, for Perfetto')
+    parser.add_argument('--benchmark-cue', metavar='FILE', help='Measure /cue and /go latency for FILE and exit')
+    parser.add_argument('--benchmark-runs', type=int, default=10, help='Number of runs for --benchmark-cue')
+    parser.add_argument('--benchmark-startup', action='store_true',
+                        help='Measure time to OSC listening and to black screen after launch and exit')
     args = parser.parse_args()
     
     # Set video directory from command line
-    global video_directory, volume_step
+    global video_directory, volume_step, logger, crossfade_seconds, stop_timeout
+    global osc_transport, event_loop, preload_count
+    global profile_max_height, profile_max_fps, profile_max_bitrate, is_running
+    global stop_fade_seconds, audio_card, audio_control, tracer
     video_directory = args.video_dir
+    stop_timeout = max(0.0, args.stop_timeout)
+    crossfade_seconds = max(0.0, args.crossfade)
+    stop_fade_seconds = max(0.0, args.stop_fade)
+    audio_card = args.audio_card
+    audio_control = args.audio_control
+    
+    # Setup logging with custom file if provided
+    logger = setup_logging(args.log_file, getattr(logging, args.log_level))
     
     # Ensure video directory exists
     if not Path(video_directory).exists():
@@ -372,78 +3352,91 @@ def main():
     if args.volume_step:
         volume_step = max(1, min(20, args.volume_step))
     
-    # Setup logging with custom file if provided
-    if args.log_file:
-        global logger
-        logger = setup_logging(args.log_file)
-    
     logger.info(f"Starting Video Player on {args.ip}:{args.port}")
     logger.info(f"Video directory: {video_directory}")
     logger.info(f"Volume step: {volume_step}")
     
-    # Disable screen blanking/screensaver
-    try:
-        subprocess.run(["xset", "-dpms"], env=VLC_ENV, check=False)
-        subprocess.run(["xset", "s", "off"], env=VLC_ENV, check=False)
-        subprocess.run(["xset", "s", "noblank"], env=VLC_ENV, check=False)
-        logger.info("Disabled screen blanking/screensaver")
-    except Exception as e:
-        logger.warning(f"Could not disable screen blanking: {e}")
-    
-    # Set up OSC dispatcher with a generic handler
-    dispatcher_obj = dispatcher.Dispatcher()
-    
-    # Map the generic handler to all OSC addresses
-    dispatcher_obj.map("/*", handle_osc_message)
+    if args.trace_file:
+        try:
+            tracer = Tracer(args.trace_file)
+            atexit.register(tracer.close)
+            logger.info(f"Tracing OSC commands to {args.trace_file}")
+        except OSError as e:
+            logger.error(f"Could not open trace file: {e}")
     
-    # Start OSC server
+    # Bind the OSC socket before anything else, so a cue sent while the
+    # rest of startup runs (e.g. after a crash and restart) isn't lost
+    dispatcher_obj = TimedDispatcher()
+    dispatcher_obj.map("/*", enqueue_osc_message, needs_reply_address=True)
+    event_loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+    asyncio.set_event_loop(event_loop)
     try:
-        server = osc_server.ThreadingOSCUDPServer((args.ip, args.port), dispatcher_obj)
-        server_thread = threading.Thread(target=server.serve_forever)
-        server_thread.daemon = True
-        
-        logger.info(f"OSC server started on {args.ip}:{args.port}")
-        server_thread.start()
+        server = osc_server.AsyncIOOSCUDPServer((args.ip, args.port), dispatcher_obj, event_loop)
+        osc_transport, _ = event_loop.run_until_complete(server.create_serve_endpoint())
+        listening_time = seconds_since_launch()
+        logger.info(f"OSC server started on {args.ip}:{args.port}"
+                    f"{' (uvloop)' if uvloop else ''}, {listening_time * 1000:.0f} ms after launch")
     except Exception as e:
         logger.error(f"Error starting OSC server: {e}")
         sys.exit(1)
     
-    # Make sure required packages are installed
-    try:
-        # Check if feh is available
-        subprocess.run(["which", "feh"], check=True)
-    except subprocess.CalledProcessError:
-        logger.warning("feh not found. Installing required packages...")
-        try:
-            subprocess.run(["sudo", "apt-get", "update", "-qq"], check=True)
-            subprocess.run(["sudo", "apt-get", "install", "-y", "feh", "unclutter"], check=True)
-            logger.info("Required packages installed")
-        except Exception as e:
-            logger.error(f"Failed to install required packages: {e}")
+    # Report missing programs once, rather than looking them up during a show
+    preflight(args.transcode)
     
-    # Show blank screen at startup
-    stop_video()
+    if args.metrics_port:
+        try:
+            start_metrics_server(args.metrics_ip, args.metrics_port)
+        except OSError as e:
+            logger.error(f"Error starting metrics server: {e}")
+    
+    # Do the rest of startup in parallel. The command queue holds incoming
+    # cues until it is done, and they then run in the order they arrived
+    profile_max_height = args.max_height
+    profile_max_fps = args.max_fps
+    profile_max_bitrate = int(args.max_bitrate * 1_000_000)
+    preload_count = max(0, args.preload_count)
+    startup = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="startup")
+    display_task = startup.submit(setup_display, args.benchmark_startup)
+    startup_tasks = [
+        startup.submit(watch_mixer),
+        startup.submit(setup_media, args),
+        display_task,
+        # Start both persistent VLC players so the first cue doesn't pay for it
+        *(startup.submit(ensure_player, slot) for slot in range(len(SLOT_NAMES))),
+    ]
+    startup.shutdown(wait=False)
+    command_executor.submit(wait_for_startup, startup_tasks)
+    
+    if args.benchmark_startup:
+        concurrent.futures.wait(startup_tasks)
+        benchmark_startup(listening_time, display_task.result(), seconds_since_launch())
+        shutdown_children()
+        sys.exit(0)
+    
+    if args.benchmark_cue:
+        concurrent.futures.wait(startup_tasks)
+        success = benchmark_cue(args.benchmark_cue, max(1, args.benchmark_runs))
+        shutdown_children()
+        sys.exit(0 if success else 1)
     
     # Handle graceful shutdown
-    def signal_handler(sig, frame):
-        global is_running
+    def signal_handler(sig):
         logger.info(f"Received signal {sig}, shutting down...")
-        stop_video()
-        is_running = False
-        sys.exit(0)
+        event_loop.stop()
     
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    event_loop.add_signal_handler(signal.SIGINT, signal_handler, signal.SIGINT)
+    event_loop.add_signal_handler(signal.SIGTERM, signal_handler, signal.SIGTERM)
     
-    # Keep main thread alive
-    try:
-        logger.info("Video Player is running. Press Ctrl+C to exit.")
-        while is_running:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        logger.info("Keyboard interrupt received, shutting down...")
-        stop_video()
-        sys.exit(0)
+    # Serve OSC until a signal stops the loop
+    logger.info("Video Player is running. Press Ctrl+C to exit.")
+    event_loop.run_forever()
+    
+    is_running = False
+    osc_transport.close()
+    command_executor.shutdown(wait=True, cancel_futures=True)
+    shutdown_children()
+    event_loop.close()
+    sys.exit(0)
 
 if __name__ == "__main__":
     main()